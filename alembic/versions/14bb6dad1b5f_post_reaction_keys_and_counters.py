@@ -0,0 +1,62 @@
+"""post reaction keys and counters
+
+Revision ID: 14bb6dad1b5f
+Revises: 99e06da92e1d
+Create Date: 2026-10-18 10:12:31.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '14bb6dad1b5f'
+down_revision: Union[str, None] = '99e06da92e1d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def rebuild_with_primary_key(table, post_column, primary_key):
+    # Copy the distinct, non-null pairs into a keyed table and swap it in, which
+    # drops duplicate rows left behind by the old unkeyed tables.
+    op.create_table(f'{table}_new',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column(post_column, sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint([post_column], ['posts.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint(*primary_key, name=f'{table}_pkey')
+    )
+    # post_favorite is missing on databases built by the initial revision
+    # before it created that table, so there may be nothing to copy.
+    if sa.inspect(op.get_bind()).has_table(table):
+        op.execute(
+            f'INSERT INTO {table}_new (user_id, {post_column}) '
+            f'SELECT DISTINCT user_id, {post_column} FROM {table} '
+            f'WHERE user_id IS NOT NULL AND {post_column} IS NOT NULL'
+        )
+        op.drop_table(table)
+    op.rename_table(f'{table}_new', table)
+
+
+def upgrade() -> None:
+    rebuild_with_primary_key('post_like', 'post_id', ['user_id', 'post_id'])
+    rebuild_with_primary_key('post_favorite', 'fav_id', ['user_id', 'fav_id'])
+
+    op.add_column('posts', sa.Column('like_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('posts', sa.Column('favorite_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute(
+        'UPDATE posts SET '
+        'like_count = (SELECT count(*) FROM post_like WHERE post_like.post_id = posts.id), '
+        'favorite_count = (SELECT count(*) FROM post_favorite WHERE post_favorite.fav_id = posts.id)'
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('posts') as batch_op:
+        batch_op.drop_column('favorite_count')
+        batch_op.drop_column('like_count')
+    for table in ('post_favorite', 'post_like'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_constraint(f'{table}_pkey', type_='primary')
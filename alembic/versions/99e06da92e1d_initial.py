@@ -46,11 +46,18 @@ def upgrade() -> None:
     sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ),
     sa.ForeignKeyConstraint(['user_id'], ['users.id'], )
     )
+    op.create_table('post_favorite',
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('fav_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['fav_id'], ['posts.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], )
+    )
     # ### end Alembic commands ###
 
 
 def downgrade() -> None:
     # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_table('post_favorite')
     op.drop_table('post_like')
     op.drop_index(op.f('ix_posts_id'), table_name='posts')
     op.drop_table('posts')
@@ -0,0 +1,72 @@
+"""post created_at and feed ranking
+
+Revision ID: 9efc492da005
+Revises: 6430aee472e8
+Create Date: 2026-10-18 03:48:24.793283
+
+"""
+import math
+import os
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9efc492da005'
+down_revision: Union[str, None] = '6430aee472e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The scoring of db.ranking as of this revision, kept here so later changes to
+# the app don't change what this migration does.
+FEED_EPOCH = datetime(2023, 1, 1)
+FEED_DECAY_SECONDS = float(os.getenv('FEED_DECAY_SECONDS', 45000))
+FEED_FAVORITE_WEIGHT = float(os.getenv('FEED_FAVORITE_WEIGHT', 2))
+BATCH_SIZE = 5000
+
+posts = sa.table(
+    'posts',
+    sa.column('id', sa.Integer),
+    sa.column('like_count', sa.Integer),
+    sa.column('favorite_count', sa.Integer),
+    sa.column('created_at', sa.DateTime),
+)
+post_ranking = sa.table('post_ranking', sa.column('post_id', sa.Integer), sa.column('score', sa.Float))
+
+
+def score(post) -> float:
+    points = post.like_count + FEED_FAVORITE_WEIGHT * post.favorite_count
+    return math.log10(1 + max(points, 0)) + (post.created_at - FEED_EPOCH).total_seconds() / FEED_DECAY_SECONDS
+
+
+def upgrade() -> None:
+    # Existing posts have no known creation time and all start from the
+    # migration time, so at first they are ranked by their counters alone.
+    op.add_column('posts', sa.Column('created_at', sa.DateTime(), nullable=True))
+    op.execute('UPDATE posts SET created_at = CURRENT_TIMESTAMP')
+    if op.get_bind().dialect.name != 'sqlite':
+        op.alter_column('posts', 'created_at', nullable=False)
+
+    op.create_table('post_ranking',
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ),
+    sa.PrimaryKeyConstraint('post_id')
+    )
+    op.create_index('ix_post_ranking_score', 'post_ranking', ['score', 'post_id'], unique=False)
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.select(posts.c.id, posts.c.like_count, posts.c.favorite_count, posts.c.created_at)
+        .execution_options(yield_per=BATCH_SIZE)
+    )
+    for batch in rows.partitions():
+        connection.execute(sa.insert(post_ranking), [{'post_id': post.id, 'score': score(post)} for post in batch])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_post_ranking_score', table_name='post_ranking')
+    op.drop_table('post_ranking')
+    op.drop_column('posts', 'created_at')
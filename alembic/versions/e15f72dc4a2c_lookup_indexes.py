@@ -0,0 +1,49 @@
+"""lookup indexes
+
+Revision ID: e15f72dc4a2c
+Revises: 9efc492da005
+Create Date: 2026-10-18 03:53:55.866884
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e15f72dc4a2c'
+down_revision: Union[str, None] = '9efc492da005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (name, table, columns, unique)
+INDEXES = [
+    ('ix_posts_author_id_id', 'posts', ['author_id', 'id'], False),
+    ('ix_post_like_post_id_user_id', 'post_like', ['post_id', 'user_id'], True),
+    ('ix_post_favorite_fav_id_user_id', 'post_favorite', ['fav_id', 'user_id'], True),
+]
+# Plain indexes on the primary key columns, which the primary keys already cover.
+REDUNDANT_INDEXES = [
+    ('ix_posts_id', 'posts', ['id']),
+    ('ix_users_id', 'users', ['id']),
+]
+
+
+def upgrade() -> None:
+    # Built concurrently on Postgres so live tables stay writable meanwhile,
+    # which can't happen inside the migration transaction.
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            op.create_index(name, table, columns, unique=unique, postgresql_concurrently=True)
+        for name, table, columns in REDUNDANT_INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in REDUNDANT_INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+        for name, table, columns, unique in INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -1,124 +1,230 @@
-import requests
-from fastapi import APIRouter, Depends, HTTPException, status
+import os
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from fastapi.security.utils import get_authorization_scheme_param
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached, object_session, selectinload
 from jose import JWTError, jwt
 
 from db.models import User, Post
-from core.database import get_db
-from .schemas import UserRegistration, UserLogin, UserProfile, PostResponse, UserWithPosts
-from core.security import verify_password, create_access_token, decode_access_token, get_password_hash
+from core.database import get_db, open_read_session
+from .schemas import UserRegistration, UserLogin, UserProfile, UserWithPosts, Token, TokenRefresh, TokenLogout
+from core.security import create_access_token, create_refresh_token, decode_access_token
+from core.hashing import hash_pool
+from core.cache import TTLCache
+from core.email_verification import EmailVerifier, get_email_verifier
+from core.response_cache import response_cache
+from core.responses import ModelResponse
+from core.revocation import revoked_tokens
+from .fields import POST_COLUMNS, post_fields, serialize_post, with_post_fields
 
 
 router = APIRouter()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='/auth/login')
 
+PRINCIPAL_CACHE_TTL = float(os.getenv('PRINCIPAL_CACHE_TTL', 60))
+PRINCIPAL_CACHE_SIZE = int(os.getenv('PRINCIPAL_CACHE_SIZE', 10000))
+
+# token -> decoded claims, and user id -> column snapshot of the user row
+principal_cache = TTLCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+user_snapshots = TTLCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+
+USER_SNAPSHOT_FIELDS = ('id', 'username', 'email', 'fullname')
+
+
+def snapshot_user(user: User) -> dict:
+    return {field: getattr(user, field) for field in USER_SNAPSHOT_FIELDS}
 
-EMAIL_HUNTER_API_KEY = 'fb79abfb32d8042d0b5273e47d2a5fbe3f4091f4'
-EMAIL_HUNTER_URL = 'https://api.emailhunter.co/v2/email-verifier'
 
+def invalidate_user(user_id: int):
+    user_snapshots.pop(user_id)
 
-def verify_email(email):
-    params = {
-        'email': email,
-        'api_key': EMAIL_HUNTER_API_KEY
-    }
 
-    response = requests.get(EMAIL_HUNTER_URL, params=params)
-    data = response.json()
+@event.listens_for(User, 'after_update')
+def invalidate_updated_user(mapper, connection, target):
+    if object_session(target).is_modified(target, include_collections=False):
+        invalidate_user(target.id)
 
-    if 'data' in data and 'status' in data['data']:
-        status = data['data']['status']
-        if status == 'valid':
-            return True
-        else:
-            return False
-    else:
-        return False
 
+@event.listens_for(User, 'after_delete')
+def invalidate_deleted_user(mapper, connection, target):
+    invalidate_user(target.id)
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    decoded_token = decode_access_token(token)
+
+async def decode_principal(token: str, token_type: str = 'access'):
+    decoded_token = principal_cache.get(token)
+    if decoded_token is None:
+        decoded_token = decode_access_token(token)
+        if decoded_token is None or not decoded_token.get("sub"):
+            return None
+        principal_cache.set(token, decoded_token, ttl=decoded_token.get("exp", 0) - time.time())
+    # Access tokens issued before refresh tokens existed carry no type or jti.
+    if decoded_token.get("type", "access") != token_type:
+        return None
+    jti = decoded_token.get("jti")
+    if jti is not None and await revoked_tokens.is_revoked(jti):
+        return None
+    return decoded_token
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> User:
+    decoded_token = await decode_principal(token)
     if decoded_token is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail='Invalid authentication token',
             headers={"WWW-Authenticate": "Bearer"}
         )
-    user_id = decoded_token.get("sub")
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail='Invalid authentication token',
-            headers={"WWW-Authenticate": "Bearer"}
-        )
-    user = db.query(User).filter(User.id == user_id).first()
+    user_id = int(decoded_token["sub"])
+    # Lets the session pin this user to the primary once it commits a write.
+    db.info['user_id'] = user_id
+
+    snapshot = user_snapshots.get(user_id)
+    if snapshot is not None:
+        # Attach the cached row to this request's session without a SELECT.
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        return await db.merge(user, load=False)
+
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail='User not found',
             headers={"WWW-Authenticate": "Bearer"}
         )
+    user_snapshots.set(user_id, snapshot_user(user))
     return user
 
 
+async def get_read_db(request: Request):
+    """Session for read-only handlers, routed to a replica unless the caller
+    recently wrote through the primary."""
+    scheme, token = get_authorization_scheme_param(request.headers.get('Authorization'))
+    decoded_token = await decode_principal(token) if scheme.lower() == 'bearer' and token else None
+    db = await open_read_session(int(decoded_token['sub']) if decoded_token else None)
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
 @router.post('/auth/register/', response_model=UserProfile, tags=['auth'])
-def register(user: UserRegistration, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(User.username == user.username).first()
+async def register(
+    user: UserRegistration,
+    db: AsyncSession = Depends(get_db),
+    email_verifier: EmailVerifier = Depends(get_email_verifier),
+):
+    existing_user = await db.scalar(select(User).where(User.username == user.username))
     if existing_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Username already taken')
 
-    existing_email = db.query(User).filter(User.email == user.email).first()
+    existing_email = await db.scalar(select(User).where(User.email == user.email))
     if existing_email:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Email already taken')
 
-    if not verify_email(user.email):
+    if not await email_verifier.verify(user.email):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid email address')
 
     new_user = User(username=user.username, email=user.email, fullname=user.fullname)
-    new_user.password = get_password_hash(user.password)
+    new_user.password = await hash_pool.hash(user.password)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
     return new_user
 
 
-@router.post('/auth/login', tags=['auth'])
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.password):
+def issue_tokens(user_id: int) -> Token:
+    return Token(
+        access_token=create_access_token(user_id),
+        refresh_token=create_refresh_token(user_id),
+        token_type='Bearer'
+    )
+
+
+@router.post('/auth/login', response_model=Token, tags=['auth'])
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(User).where(User.username == form_data.username))
+    if not user or not await hash_pool.verify(form_data.password, user.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid username or password')
 
-    access_token = create_access_token(user.id)
-    return {'access_token': access_token, 'token_type': 'Bearer'}
+    return ModelResponse(issue_tokens(user.id))
+
+
+@router.post('/auth/refresh', response_model=Token, tags=['auth'])
+async def refresh(body: TokenRefresh):
+    # Refreshing only checks the signature and the revocation set, so clients
+    # renew their access token without a password, bcrypt or a database query.
+    decoded_token = await decode_principal(body.refresh_token, 'refresh')
+    # Each refresh token is single-use: revoking it is also the check that no
+    # concurrent request redeemed it first.
+    if decoded_token is None or not await revoked_tokens.revoke(decoded_token['jti'], decoded_token['exp']):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail='Invalid refresh token',
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return ModelResponse(issue_tokens(int(decoded_token['sub'])))
+
+
+@router.post('/auth/logout', tags=['auth'])
+async def logout(body: Optional[TokenLogout] = None, token: str = Depends(oauth2_scheme)):
+    decoded_token = await decode_principal(token)
+    if decoded_token is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail='Invalid authentication token',
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    if decoded_token.get('jti'):
+        await revoked_tokens.revoke(decoded_token['jti'], decoded_token['exp'])
+    principal_cache.pop(token)
+
+    if body is not None and body.refresh_token:
+        refresh_token = await decode_principal(body.refresh_token, 'refresh')
+        if refresh_token is not None and refresh_token['sub'] == decoded_token['sub']:
+            await revoked_tokens.revoke(refresh_token['jti'], refresh_token['exp'])
+    return {"message": "Logged out"}
+
+
+def post_columns(fields):
+    # The author of every post here is the profile's user, so only posts
+    # columns are ever selected.
+    return [Post.id, *(column for name, column in POST_COLUMNS.items() if fields is None or name in fields)]
 
 
 @router.get('/auth/profile/{user_id}', response_model=UserWithPosts, tags=['auth'])
-def get_profile(user_id: int, db: Session = Depends(get_db)):
-    user_info = db.query(User).get(user_id)
+async def get_profile(user_id: int, request: Request, fields=Depends(post_fields), db: AsyncSession = Depends(get_db)):
+    # Read from the primary for the same reason as get_post.
+    cache_key = await response_cache.key('user', user_id)
+    if fields is not None:
+        cache_key += ':' + ','.join(sorted(fields))
+    cached = await response_cache.get(cache_key, request)
+    if cached is not None:
+        return cached
+
+    user_info = await db.get(User, user_id, options=[selectinload(User.posts).load_only(*post_columns(fields))])
     if not user_info:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='User not found')
 
-    user_posts = [
-        PostResponse(
-            id=post.id, title=post.title, content=post.content, author=user_info
-        )
-        for post in user_info.posts
-    ]
-
-    user_with_posts = UserWithPosts(user_profile=user_info, user_posts=user_posts)
-    return user_with_posts
+    user_posts = [serialize_post(post, user_info, fields) for post in user_info.posts]
+    user_with_posts = with_post_fields(UserWithPosts, fields)(user_profile=user_info, user_posts=user_posts)
+    return await response_cache.store(cache_key, request, user_with_posts)
 
 
 @router.get('/auth/current_user', response_model=UserWithPosts, tags=['auth'])
-def get_logged_in_user(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    user_posts = [
-        PostResponse(
-            id=post.id, title=post.title, content=post.content, author=current_user
-        )
-        for post in current_user.posts
-    ]
-
-    user_with_posts = UserWithPosts(user_profile=current_user, user_posts=user_posts)
-    return user_with_posts
\ No newline at end of file
+async def get_logged_in_user(
+    fields=Depends(post_fields),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    posts = await db.execute(
+        select(*post_columns(fields)).where(Post.author_id == current_user.id).order_by(Post.id)
+    )
+    user_posts = [serialize_post(post, current_user, fields) for post in posts]
+    user_with_posts = with_post_fields(UserWithPosts, fields)(user_profile=current_user, user_posts=user_posts)
+    return ModelResponse(user_with_posts)
\ No newline at end of file
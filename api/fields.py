@@ -0,0 +1,82 @@
+from functools import lru_cache
+from typing import FrozenSet, List, Optional
+
+from fastapi import HTTPException, Query, status
+from pydantic import BaseModel, create_model
+from sqlalchemy.orm import joinedload, load_only
+
+from db.models import Post
+from .schemas import PostResponse
+
+POST_FIELDS = tuple(PostResponse.model_fields)
+POST_COLUMNS = {
+    'title': Post.title,
+    'content': Post.content,
+    'like_count': Post.like_count,
+    'favorite_count': Post.favorite_count,
+}
+
+
+def post_fields(
+    fields: Optional[str] = Query(
+        None, description=f'Comma-separated subset of post fields to return: {", ".join(POST_FIELDS)}'
+    ),
+) -> Optional[FrozenSet[str]]:
+    """None means every field, which keeps the unmodified PostResponse path."""
+    if fields is None:
+        return None
+    requested = frozenset(field.strip() for field in fields.split(',') if field.strip())
+    unknown = requested.difference(POST_FIELDS)
+    if not requested or unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Unknown fields: {", ".join(sorted(unknown))}' if unknown else 'No fields requested'
+        )
+    return None if requested == frozenset(POST_FIELDS) else requested
+
+
+@lru_cache(maxsize=None)
+def post_model(fields: Optional[FrozenSet[str]]) -> type:
+    # At most one model per subset of POST_FIELDS is ever built.
+    if fields is None:
+        return PostResponse
+    return create_model(
+        'PostFields_' + '_'.join(sorted(fields)),
+        __config__=PostResponse.model_config,
+        **{name: (info.annotation, info) for name, info in PostResponse.model_fields.items() if name in fields}
+    )
+
+
+@lru_cache(maxsize=None)
+def with_post_fields(container: type, fields: Optional[FrozenSet[str]]) -> type:
+    """``container`` (a page or profile schema) with its List[PostResponse]
+    fields narrowed to ``fields``."""
+    if fields is None:
+        return container
+    item = List[post_model(fields)]
+    return create_model(
+        f'{container.__name__}_' + '_'.join(sorted(fields)),
+        __config__=container.model_config,
+        **{
+            name: (item if info.annotation == List[PostResponse] else info.annotation, info)
+            for name, info in container.model_fields.items()
+        }
+    )
+
+
+def post_load_options(fields: Optional[FrozenSet[str]]) -> list:
+    """Loader options that select only the columns ``fields`` needs; content
+    in particular is left out of list queries unless it was asked for."""
+    if fields is None:
+        return [joinedload(Post.author)]
+    options = [load_only(Post.id, *(column for name, column in POST_COLUMNS.items() if name in fields))]
+    if 'author' in fields:
+        options.append(joinedload(Post.author))
+    return options
+
+
+def serialize_post(post, author, fields: Optional[FrozenSet[str]]) -> BaseModel:
+    values = {'id': post.id, 'author': author}
+    values.update((name, getattr(post, name)) for name in POST_COLUMNS if fields is None or name in fields)
+    model = post_model(fields)
+    return model(**{name: value for name, value in values.items() if name in model.model_fields})
@@ -1,130 +1,429 @@
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from db.models import Post, User
-from core.database import get_db
-from .schemas import PostCreate, PostUpdate, PostResponse, LikedPostResponse
-from .auth import get_current_user
+from typing import Optional, Union
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import conlist
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from db.models import Post, User, post_like, post_favorite, post_ranking
+from db.ranking import RANK_COLUMNS, feed_query, rank_new_posts, rerank_posts
+from db.search import search_posts_query
+from core.database import get_db, insert_ignore, open_read_session
+from core.response_cache import response_cache
+from core.responses import ModelResponse
+from core.write_behind import reaction_queue
+from .schemas import (
+    BULK_MAX_ITEMS, PostCreate, PostUpdate, PostResponse, UserProfile, PostPage, PostIdPage, PostSearchPage,
+    PostFeedPage, PostBulkResult, PostLikeBulk, PostLikeBulkResult
+)
+from .auth import get_current_user, get_read_db
+from .fields import POST_COLUMNS, post_fields, post_load_options, post_model, serialize_post, with_post_fields
 
 router = APIRouter()
 
-
-@router.get('/posts/', response_model=list[PostResponse], tags=['posts'])
-def post_list(db: Session = Depends(get_db)):
-    posts = db.query(Post).all()
-    return posts
+POSTS_PAGE_SIZE = 50
+POSTS_MAX_PAGE_SIZE = 500
+POSTS_STREAM_CHUNK_SIZE = 1000
+
+
+def post_page_query(after: Optional[int], limit: int, fields=None):
+    query = select(Post).options(*post_load_options(fields)).order_by(Post.id).limit(limit)
+    if after is not None:
+        query = query.where(Post.id > after)
+    return query
+
+
+async def stream_posts(after: Optional[int], fields=None):
+    model = post_model(fields)
+    db = await open_read_session()
+    try:
+        while True:
+            posts = (await db.scalars(post_page_query(after, POSTS_STREAM_CHUNK_SIZE, fields))).all()
+            if not posts:
+                break
+            yield ''.join(model.model_validate(post).model_dump_json() + '\n' for post in posts)
+            if len(posts) < POSTS_STREAM_CHUNK_SIZE:
+                break
+            after = posts[-1].id
+            db.expunge_all()
+    finally:
+        await db.close()
+
+
+@router.get('/posts/', response_model=PostPage, tags=['posts'])
+async def post_list(
+    limit: int = Query(POSTS_PAGE_SIZE, ge=1, le=POSTS_MAX_PAGE_SIZE),
+    after: Optional[int] = Query(None, description='Return posts with an id greater than this cursor'),
+    stream: bool = Query(False, description='Stream every post after the cursor as NDJSON'),
+    fields=Depends(post_fields),
+    db: AsyncSession = Depends(get_read_db),
+):
+    if stream:
+        return StreamingResponse(stream_posts(after, fields), media_type='application/x-ndjson')
+
+    posts = (await db.scalars(post_page_query(after, limit + 1, fields))).all()
+    next_cursor = None
+    if len(posts) > limit:
+        posts = posts[:limit]
+        next_cursor = posts[-1].id
+    page = with_post_fields(PostPage, fields).model_validate(
+        {'posts': posts, 'next_cursor': next_cursor}, from_attributes=True
+    )
+    return ModelResponse(page)
+
+
+def parse_score_cursor(after: Optional[str]):
+    if after is None:
+        return None
+    score, _, post_id = after.rpartition(':')
+    try:
+        return float(score), int(post_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid cursor')
+
+
+@router.get('/posts/search', response_model=PostSearchPage, tags=['posts'])
+async def search_posts(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(POSTS_PAGE_SIZE, ge=1, le=POSTS_MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None, description='next_cursor of the previous page'),
+    db: AsyncSession = Depends(get_read_db),
+):
+    query = search_posts_query(db.bind.dialect.name, q, parse_score_cursor(after), limit + 1)
+    rows = (await db.execute(query)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f'{rows[-1].rank!r}:{rows[-1].Post.id}'
+    page = PostSearchPage.model_validate(
+        {'posts': [row.Post for row in rows], 'next_cursor': next_cursor}, from_attributes=True
+    )
+    return ModelResponse(page)
+
+
+@router.get('/feed', response_model=PostFeedPage, tags=['posts'])
+async def feed(
+    limit: int = Query(POSTS_PAGE_SIZE, ge=1, le=POSTS_MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None, description='next_cursor of the previous page'),
+    db: AsyncSession = Depends(get_read_db),
+):
+    rows = (await db.execute(feed_query(parse_score_cursor(after), limit + 1))).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f'{rows[-1].score!r}:{rows[-1].Post.id}'
+    page = PostFeedPage.model_validate(
+        {'posts': [row.Post for row in rows], 'next_cursor': next_cursor}, from_attributes=True
+    )
+    return ModelResponse(page)
 
 
 @router.post('/posts/create', response_model=PostResponse, tags=['posts'])
-def create_post(post: PostCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    new_post = Post(title=post.title, content=post.content, author_id=current_user.id)
+async def create_post(post: PostCreate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    new_post = Post(title=post.title, content=post.content, author=current_user)
     db.add(new_post)
-    db.commit()
-    db.refresh(new_post)
+    await db.flush()
+    await rank_new_posts(db, [new_post])
+    await db.commit()
+    await response_cache.invalidate('user', current_user.id)
     return new_post
 
 
+@router.post('/posts/bulk', response_model=list[PostBulkResult], tags=['posts'])
+async def create_posts_bulk(
+    posts: conlist(PostCreate, min_length=1, max_length=BULK_MAX_ITEMS),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    rows = [{'title': post.title, 'content': post.content, 'author_id': current_user.id} for post in posts]
+    created = await db.execute(
+        insert(Post).returning(*RANK_COLUMNS, sort_by_parameter_order=True), rows
+    )
+    created = created.all()
+    await rank_new_posts(db, created)
+    await db.commit()
+    await response_cache.invalidate('user', current_user.id)
+
+    author = UserProfile.model_validate(current_user)
+    return ModelResponse([
+        PostBulkResult(
+            index=index,
+            status_code=status.HTTP_201_CREATED,
+            post=PostResponse(
+                id=row.id, title=post.title, content=post.content, author=author,
+                like_count=row.like_count, favorite_count=row.favorite_count
+            )
+        )
+        for index, (post, row) in enumerate(zip(posts, created))
+    ])
+
+
+@router.post('/posts/likes/bulk', response_model=list[PostLikeBulkResult], tags=['post_likes'])
+async def like_posts_bulk(likes: PostLikeBulk, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    post_ids = list(dict.fromkeys(likes.post_ids))
+    authors = dict((await db.execute(select(Post.id, Post.author_id).where(Post.id.in_(post_ids)))).all())
+    already_liked = set(await db.scalars(
+        select(post_like.c.post_id).where(post_like.c.user_id == current_user.id, post_like.c.post_id.in_(post_ids))
+    ))
+
+    eligible = [
+        post_id for post_id in post_ids
+        if post_id in authors and authors[post_id] != current_user.id and post_id not in already_liked
+    ]
+    liked = set()
+    if eligible:
+        inserted = await db.execute(
+            insert_ignore(db, post_like).returning(post_like.c.post_id),
+            [{'user_id': current_user.id, 'post_id': post_id} for post_id in eligible]
+        )
+        liked = set(inserted.scalars())
+    if liked:
+        counters = await db.execute(
+            update(Post).where(Post.id.in_(liked)).values(like_count=Post.like_count + 1).returning(*RANK_COLUMNS)
+        )
+        await rerank_posts(db, counters.all())
+    await db.commit()
+    await response_cache.invalidate('post', *liked)
+    await response_cache.invalidate('user', *{authors[post_id] for post_id in liked})
+
+    results = []
+    seen = set()
+    for post_id in likes.post_ids:
+        if post_id not in authors:
+            result = (status.HTTP_404_NOT_FOUND, 'Post not found')
+        elif authors[post_id] == current_user.id:
+            result = (status.HTTP_400_BAD_REQUEST, 'You cannot like your own post')
+        elif post_id in liked and post_id not in seen:
+            result = (status.HTTP_200_OK, 'Post liked')
+        else:
+            result = (status.HTTP_400_BAD_REQUEST, 'Post already liked')
+        seen.add(post_id)
+        results.append(PostLikeBulkResult(post_id=post_id, status_code=result[0], detail=result[1]))
+    return ModelResponse(results)
+
+
 @router.get('/posts/{post_id}', response_model=PostResponse, tags=['posts'])
-def get_post(post_id: int, db: Session = Depends(get_db)):
-    post = db.query(Post).get(post_id)
+async def get_post(post_id: int, request: Request, fields=Depends(post_fields), db: AsyncSession = Depends(get_db)):
+    # A miss is stored under the current version, so it is read from the
+    # primary: a lagging replica would cache the pre-write body as the new one.
+    cache_key = await response_cache.key('post', post_id)
+    if fields is not None:
+        cache_key += ':' + ','.join(sorted(fields))
+    cached = await response_cache.get(cache_key, request)
+    if cached is not None:
+        return cached
+
+    post = await db.get(Post, post_id, options=post_load_options(fields))
     if not post:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Post not found')
-    return post
+    return await response_cache.store(cache_key, request, post_model(fields).model_validate(post))
 
 
 @router.put('/posts/{post_id}', response_model=PostResponse, tags=['posts'])
-def update_post(post_id: int, post: PostUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    existing_post = db.query(Post).filter(Post.id == post_id, Post.author_id == current_user.id).first()
+async def update_post(post_id: int, post: PostUpdate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    existing_post = await db.scalar(
+        select(Post).options(joinedload(Post.author)).where(Post.id == post_id, Post.author_id == current_user.id)
+    )
 
     if existing_post is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found or you don't have permission to update it")
 
     existing_post.title = post.title
     existing_post.content = post.content
-    db.commit()
-    db.refresh(existing_post)
+    await db.commit()
+    await response_cache.invalidate('post', post_id)
+    await response_cache.invalidate('user', current_user.id)
     return existing_post
 
 
 @router.delete('/posts/{post_id}', response_model=PostResponse, tags=['posts'])
-def delete_post(post_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    existing_post = db.query(Post).filter(Post.id == post_id, Post.author_id == current_user.id).first()
+async def delete_post(post_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    existing_post = await db.scalar(
+        select(Post).options(joinedload(Post.author)).where(Post.id == post_id, Post.author_id == current_user.id)
+    )
 
     if existing_post is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found or you don't have permission to delete it")
 
-    db.delete(existing_post)
-    db.commit()
+    await db.execute(delete(post_like).where(post_like.c.post_id == post_id))
+    await db.execute(delete(post_favorite).where(post_favorite.c.fav_id == post_id))
+    await db.execute(delete(post_ranking).where(post_ranking.c.post_id == post_id))
+    await db.execute(delete(Post).where(Post.id == post_id))
+    await db.commit()
+    await response_cache.invalidate('post', post_id)
+    await response_cache.invalidate('user', current_user.id)
 
     return existing_post
 
 
-@router.post('/posts/{post_id}/like', tags=['post_likes'])
-def like_post(post_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    post = db.query(Post).get(post_id)
-    if not post:
+async def update_counter(db: AsyncSession, post_id: int, **values):
+    # The ranking is kept in step with the counters inside the same transaction.
+    counters = await db.execute(update(Post).where(Post.id == post_id).values(**values).returning(*RANK_COLUMNS))
+    await rerank_posts(db, counters.all())
+
+
+async def get_post_counters(db: AsyncSession, post_id: int):
+    post = (await db.execute(
+        select(Post.author_id, Post.like_count, Post.favorite_count).where(Post.id == post_id)
+    )).first()
+    if post is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Post not found')
-    if current_user.id == post.author.id:
+    return post
+
+
+async def queue_reaction(db: AsyncSession, kind: str, post_id: int, post, user_id: int, active: bool, message: str, conflict: str):
+    if not await reaction_queue.submit(db, kind, user_id, post_id, post.author_id, active):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=conflict)
+    return ORJSONResponse({"message": message}, status_code=status.HTTP_202_ACCEPTED)
+
+
+@router.post('/posts/{post_id}/like', tags=['post_likes'])
+async def like_post(post_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    post = await get_post_counters(db, post_id)
+    if current_user.id == post.author_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='You cannot like your own post')
-    if current_user in post.liked_by:
+    if reaction_queue.enabled:
+        return await queue_reaction(db, 'like', post_id, post, current_user.id, True, "Post liked", "Post already liked")
+
+    inserted = await db.execute(insert_ignore(db, post_like).values(user_id=current_user.id, post_id=post_id))
+    if not inserted.rowcount:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Post already liked")
-    post.liked_by.append(current_user)
-    db.commit()
+    await update_counter(db, post_id, like_count=Post.like_count + 1)
+    await db.commit()
+    await response_cache.invalidate('post', post_id)
+    await response_cache.invalidate('user', post.author_id)
     return {"message": "Post liked"}
 
 
 @router.post('/posts/{post_id}/dislike', tags=['post_likes'])
-def dislike_post(post_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    post = db.query(Post).get(post_id)
-    if not post:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Post not found')
-    if current_user.id == post.author.id:
+async def dislike_post(post_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    post = await get_post_counters(db, post_id)
+    if current_user.id == post.author_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='You cannot dislike your own post')
-    if not post.liked_by:
+    if reaction_queue.enabled:
+        return await queue_reaction(
+            db, 'like', post_id, post, current_user.id, False,
+            "Post disliked", "You can only dislike a post that you have liked"
+        )
+    if not post.like_count:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="There are no likes on this post to dislike")
-    if current_user not in post.liked_by:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="You can only dislike a post that you have liked")
 
-    post.liked_by.remove(current_user)
-    db.commit()
+    deleted = await db.execute(
+        delete(post_like).where(post_like.c.user_id == current_user.id, post_like.c.post_id == post_id)
+    )
+    if not deleted.rowcount:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="You can only dislike a post that you have liked")
+    await update_counter(db, post_id, like_count=Post.like_count - 1)
+    await db.commit()
+    await response_cache.invalidate('post', post_id)
+    await response_cache.invalidate('user', post.author_id)
     return {"message": "Post disliked"}
 
 
-@router.get('/liked-posts', response_model=LikedPostResponse, tags=['post_likes'])
-def liked_posts(current_user: User = Depends(get_current_user)):
-    liked_posts = current_user.liked_posts
-    return {'liked_posts': liked_posts}
-
-
-@router.post('/posts/{posts_id}/favorite', tags=['favorite_post'])
-def favorite_post(post_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    post = db.query(Post).get(post_id)
-    if not post:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Post not found')
-    if current_user in post.liked_by:
+async def reacted_posts_page(
+    db: AsyncSession, post_column, user_id: int, after: Optional[int], limit: int, ids_only: bool, fields=None
+):
+    # Walks the (user_id, post id) primary key of the association table and
+    # selects only the columns the response needs, so no ORM objects are built.
+    query = select(post_column.label('id')).where(post_column.table.c.user_id == user_id)
+    if after is not None:
+        query = query.where(post_column > after)
+    query = query.order_by(post_column).limit(limit + 1)
+
+    if ids_only:
+        post_ids = list(await db.scalars(query))
+        next_cursor = None
+        if len(post_ids) > limit:
+            post_ids = post_ids[:limit]
+            next_cursor = post_ids[-1]
+        return ModelResponse(PostIdPage(post_ids=post_ids, next_cursor=next_cursor))
+
+    with_author = fields is None or 'author' in fields
+    query = query.add_columns(
+        *(column for name, column in POST_COLUMNS.items() if fields is None or name in fields)
+    ).join(Post, Post.id == post_column)
+    if with_author:
+        query = query.add_columns(
+            User.id.label('author_id'), User.username, User.email, User.fullname
+        ).join(User, User.id == Post.author_id)
+    rows = (await db.execute(query)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1].id
+    posts = [
+        serialize_post(
+            row,
+            UserProfile(id=row.author_id, username=row.username, email=row.email, fullname=row.fullname)
+            if with_author else None,
+            fields
+        )
+        for row in rows
+    ]
+    return ModelResponse(with_post_fields(PostPage, fields)(posts=posts, next_cursor=next_cursor))
+
+
+@router.get('/liked-posts', response_model=Union[PostPage, PostIdPage], tags=['post_likes'])
+async def liked_posts(
+    limit: int = Query(POSTS_PAGE_SIZE, ge=1, le=POSTS_MAX_PAGE_SIZE),
+    after: Optional[int] = Query(None, description='Return posts with an id greater than this cursor'),
+    ids_only: bool = Query(False, description='Return only the post ids, for client-side sync'),
+    fields=Depends(post_fields),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    return await reacted_posts_page(db, post_like.c.post_id, current_user.id, after, limit, ids_only, fields)
+
+
+@router.post('/posts/{post_id}/favorite', tags=['favorite_post'])
+async def favorite_post(post_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    post = await get_post_counters(db, post_id)
+    if reaction_queue.enabled:
+        return await queue_reaction(db, 'favorite', post_id, post, current_user.id, True, "Post Favorited", "Post already favorited")
+
+    inserted = await db.execute(insert_ignore(db, post_favorite).values(user_id=current_user.id, fav_id=post_id))
+    if not inserted.rowcount:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Post already favorited")
-    post.favorited_by.append(current_user)
-    db.commit()
+    await update_counter(db, post_id, favorite_count=Post.favorite_count + 1)
+    await db.commit()
+    await response_cache.invalidate('post', post_id)
+    await response_cache.invalidate('user', post.author_id)
     return {"message": "Post Favorited"}
 
 
 @router.post('/posts/{post_id}/unfavorite', tags=['favorite_post'])
-def unfavorite_post(post_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    post = db.query(Post).get(post_id)
-    if not post:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Post not found')
-    if not post.favorited_by:
+async def unfavorite_post(post_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    post = await get_post_counters(db, post_id)
+    if reaction_queue.enabled:
+        return await queue_reaction(
+            db, 'favorite', post_id, post, current_user.id, False,
+            "Post Unfavorited", "You can only unfavorite a post that you have favorite"
+        )
+    if not post.favorite_count:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="There are no favorite on this post to unfavorite")
-    if current_user not in post.favorited_by:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="You can only unfavorite a post that you have favorite")
 
-    post.favorited_by.remove(current_user)
-    db.commit()
+    deleted = await db.execute(
+        delete(post_favorite).where(post_favorite.c.user_id == current_user.id, post_favorite.c.fav_id == post_id)
+    )
+    if not deleted.rowcount:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="You can only unfavorite a post that you have favorite")
+    await update_counter(db, post_id, favorite_count=Post.favorite_count - 1)
+    await db.commit()
+    await response_cache.invalidate('post', post_id)
+    await response_cache.invalidate('user', post.author_id)
     return {"message": "Post Unfavorited"}
 
 
-@router.get('/favorite-posts', tags=['favorite_post'])
-def favorite_posts(current_user: User = Depends(get_current_user)):
-    favorite_posts = current_user.favorite_posts
-    return {'favorite_posts': favorite_posts}
+@router.get('/favorite-posts', response_model=Union[PostPage, PostIdPage], tags=['favorite_post'])
+async def favorite_posts(
+    limit: int = Query(POSTS_PAGE_SIZE, ge=1, le=POSTS_MAX_PAGE_SIZE),
+    after: Optional[int] = Query(None, description='Return posts with an id greater than this cursor'),
+    ids_only: bool = Query(False, description='Return only the post ids, for client-side sync'),
+    fields=Depends(post_fields),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    return await reacted_posts_page(db, post_favorite.c.fav_id, current_user.id, after, limit, ids_only, fields)
 
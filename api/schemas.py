@@ -1,10 +1,21 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, conlist
+from typing import List, Optional
+
+BULK_MAX_ITEMS = 500
 
 
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: str
+
+
+class TokenRefresh(BaseModel):
+    refresh_token: str
+
+
+class TokenLogout(BaseModel):
+    refresh_token: Optional[str] = None
 
 
 class UserProfile(BaseModel):
@@ -50,17 +61,51 @@ class PostCreate(PostBase):
 class PostResponse(PostBase):
     id: int
     author: UserProfile
+    like_count: int = 0
+    favorite_count: int = 0
 
     class Config:
         from_attributes = True
 
 
-class PostWithAuthorResponse(PostResponse):
-    author: UserProfile
+class PostPage(BaseModel):
+    posts: List[PostResponse]
+    next_cursor: Optional[int] = None
+
+
+class PostIdPage(BaseModel):
+    post_ids: List[int]
+    next_cursor: Optional[int] = None
+
+
+class PostSearchPage(BaseModel):
+    posts: List[PostResponse]
+    next_cursor: Optional[str] = None
 
 
-class LikedPostResponse(BaseModel):
-    liked_post: List[PostResponse]
+class PostFeedPage(BaseModel):
+    posts: List[PostResponse]
+    next_cursor: Optional[str] = None
+
+
+class PostBulkResult(BaseModel):
+    index: int
+    status_code: int
+    post: Optional[PostResponse] = None
+
+
+class PostLikeBulk(BaseModel):
+    post_ids: conlist(int, min_length=1, max_length=BULK_MAX_ITEMS)
+
+
+class PostLikeBulkResult(BaseModel):
+    post_id: int
+    status_code: int
+    detail: str
+
+
+class PostWithAuthorResponse(PostResponse):
+    author: UserProfile
 
 
 class UserWithPosts(BaseModel):
@@ -0,0 +1,39 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from core import metrics
+from core.database import database_stats
+
+from core.compression import compressor
+from core.hashing import hash_pool
+from core.email_verification import email_verifier
+from core.response_cache import response_cache
+from core.revocation import revoked_tokens
+from core.write_behind import reaction_queue
+from .auth import principal_cache, user_snapshots
+
+router = APIRouter()
+
+
+def collect_stats():
+    return {
+        'database': database_stats(),
+        'hash_pool': hash_pool.stats(),
+        'principal_cache': principal_cache.stats(),
+        'user_snapshots': user_snapshots.stats(),
+        'email_verifier': email_verifier.stats(),
+        'response_cache': response_cache.stats(),
+        'compression': compressor.stats(),
+        'revoked_tokens': revoked_tokens.stats(),
+        'reaction_queue': reaction_queue.stats(),
+    }
+
+
+@router.get('/stats', tags=['stats'])
+async def stats():
+    return collect_stats()
+
+
+@router.get('/metrics', response_class=PlainTextResponse, tags=['stats'])
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(collect_stats()), media_type='text/plain; version=0.0.4')
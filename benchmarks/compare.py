@@ -0,0 +1,35 @@
+"""Compare two benchmarks.load result files.
+
+    python -m benchmarks.compare benchmarks/results/before.json benchmarks/results/after.json
+"""
+import argparse
+import json
+
+METRICS = ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request')
+
+
+def change(before, after):
+    if before is None or after is None:
+        return '-'
+    if not before:
+        return f'{after:.1f}'
+    return f'{before:.1f} -> {after:.1f} ({(after - before) / before * 100:+.0f}%)'
+
+
+def compare(before, after):
+    print(f'throughput: {change(before["throughput_rps"], after["throughput_rps"])} req/s')
+    for endpoint in sorted(set(before['endpoints']) | set(after['endpoints'])):
+        print(endpoint)
+        old = before['endpoints'].get(endpoint, {})
+        new = after['endpoints'].get(endpoint, {})
+        for metric in METRICS:
+            print(f'    {metric:<20} {change(old.get(metric), new.get(metric))}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('before')
+    parser.add_argument('after')
+    args = parser.parse_args()
+    with open(args.before) as f, open(args.after) as g:
+        compare(json.load(f), json.load(g))
@@ -0,0 +1,97 @@
+"""CPU cost of response compression against the bytes it saves.
+
+    python -m benchmarks.compression --sizes 10 50 500 --mbps 10
+
+Payloads are PostPage bodies serialized the way the API does, with post
+content drawn from a fixed vocabulary so it compresses like real text rather
+than like a repeated string. For every encoding that is installed and every
+level asked for, the table shows the compressed size, the best-of-N time to
+compress, and the time the saved bytes take to send at ``--mbps``; "net ms"
+is what a client gains on a miss. A hit in the precompressed cache costs one
+BLAKE2 digest of the body (or nothing when the response has an ETag), shown
+as "hash ms".
+"""
+import argparse
+import hashlib
+import random
+import time
+from types import SimpleNamespace
+
+from api.schemas import PostPage
+from core.compression import available_encoders
+from core.responses import ModelResponse
+
+VOCABULARY = [
+    'alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel', 'india', 'juliet', 'kilo', 'lima',
+    'mike', 'november', 'oscar', 'papa', 'quebec', 'romeo', 'sierra', 'tango', 'uniform', 'victor', 'whiskey',
+    'xray', 'yankee', 'zulu', 'the', 'a', 'of', 'and', 'to', 'in', 'is', 'for', 'on', 'with', 'post', 'today',
+]
+
+
+def make_body(count: int, rng: random.Random) -> bytes:
+    authors = [
+        SimpleNamespace(id=i, username=f'user{i}', email=f'user{i}@example.com', fullname=f'User {i}')
+        for i in range(1, 51)
+    ]
+    rows = [
+        SimpleNamespace(
+            id=i, title=' '.join(rng.choices(VOCABULARY, k=5)), content=' '.join(rng.choices(VOCABULARY, k=60)),
+            author=rng.choice(authors), like_count=rng.randrange(500), favorite_count=rng.randrange(50)
+        )
+        for i in range(1, count + 1)
+    ]
+    page = PostPage.model_validate({'posts': rows, 'next_cursor': count}, from_attributes=True)
+    return ModelResponse(page).body
+
+
+def best_of(func, body: bytes, repeat: int):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(body)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def run(sizes, levels, mbps: float, repeat: int):
+    rng = random.Random(42)
+    bytes_per_ms = mbps * 1e6 / 8 / 1000
+    print(f'{"posts":>6} {"encoding":>9} {"level":>5} {"bytes":>9} {"ratio":>6} {"compress ms":>12} '
+          f'{"MB/s":>7} {"saved ms":>9} {"net ms":>8} {"hash ms":>8}')
+    for size in sizes:
+        body = make_body(size, rng)
+        hash_seconds, _ = best_of(lambda data: hashlib.blake2b(data, digest_size=16).digest(), body, repeat)
+        print(f'{size:>6} {"identity":>9} {"-":>5} {len(body):>9} {1:>6.3f} {0:>12.3f} {"-":>7} {0:>9.2f} {0:>8.2f} '
+              f'{hash_seconds * 1000:>8.3f}')
+        for encoding, encoding_levels in levels.items():
+            for level in encoding_levels:
+                encoders = available_encoders({encoding: level})
+                if encoding not in encoders:
+                    continue
+                seconds, compressed = best_of(encoders[encoding], body, repeat)
+                saved_ms = (len(body) - len(compressed)) / bytes_per_ms
+                print(
+                    f'{size:>6} {encoding:>9} {level:>5} {len(compressed):>9} {len(compressed) / len(body):>6.3f} '
+                    f'{seconds * 1000:>12.3f} {len(body) / seconds / 1e6:>7.1f} {saved_ms:>9.2f} '
+                    f'{saved_ms - seconds * 1000:>8.2f} {hash_seconds * 1000:>8.3f}'
+                )
+    missing = [encoding for encoding in levels if encoding not in available_encoders()]
+    if missing:
+        print(f'\nnot installed: {", ".join(missing)} (pip install brotli zstandard)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 500])
+    parser.add_argument('--gzip-levels', type=int, nargs='+', default=[1, 6, 9])
+    parser.add_argument('--br-levels', type=int, nargs='+', default=[1, 5, 11])
+    parser.add_argument('--zstd-levels', type=int, nargs='+', default=[1, 3, 9])
+    parser.add_argument('--mbps', type=float, default=10, help='Client bandwidth the saved bytes are priced at')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    run(
+        args.sizes,
+        {'zstd': args.zstd_levels, 'br': args.br_levels, 'gzip': args.gzip_levels},
+        args.mbps,
+        args.repeat,
+    )
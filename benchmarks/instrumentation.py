@@ -0,0 +1,114 @@
+"""Throughput cost of the /metrics instrumentation.
+
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.seed
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.instrumentation --rounds 10 --requests 500
+
+Drives a fixed read mix in-process, alternating between the app as it ships
+and the same app with MetricsMiddleware and the SQL hooks removed, so drift
+in the machine's speed hits both sides alike. Each round sends ``--requests``
+requests per side; the table shows the median throughput over the rounds, and
+the overhead is the median of the per-round ratios, which cancels most of the
+noise two back-to-back runs share. The pool checkout timer stays in both,
+since the pool class is fixed when the engines are built.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import httpx
+from sqlalchemy import event
+
+from benchmarks.load import StubEmailVerifier, dataset_bounds
+from core.metrics import MetricsMiddleware, after_cursor_execute, before_cursor_execute, handle_error
+
+HOOKS = (
+    ('before_cursor_execute', before_cursor_execute),
+    ('after_cursor_execute', after_cursor_execute),
+    ('handle_error', handle_error),
+)
+
+
+def engines():
+    from core.database import async_engine, engine, replicas
+
+    targets = [engine, async_engine] + [e for replica in replicas for e in (replica.engine, replica.async_engine)]
+    return [getattr(target, 'sync_engine', target) for target in targets]
+
+
+def set_instrumented(app, instrumented: bool, middleware):
+    app.user_middleware = [entry for entry in app.user_middleware if entry.cls is not MetricsMiddleware]
+    if instrumented:
+        app.user_middleware.insert(0, middleware)
+    # Starlette builds the stack again on the next request.
+    app.middleware_stack = None
+    for target in engines():
+        for name, hook in HOOKS:
+            if instrumented and not event.contains(target, name, hook):
+                event.listen(target, name, hook)
+            elif not instrumented and event.contains(target, name, hook):
+                event.remove(target, name, hook)
+
+
+def request_mix(count: int, max_user_id: int, max_post_id: int, rng: random.Random):
+    paths = []
+    for _ in range(count):
+        paths.append(rng.choice([
+            f'/posts/?limit=20&after={rng.randrange(max_post_id)}',
+            '/feed?limit=20',
+            '/posts/search?q=alpha&limit=20',
+            f'/auth/profile/{rng.randint(1, max_user_id)}',
+            f'/posts/{rng.randint(1, max_post_id)}',
+        ]))
+    return paths
+
+
+async def drive(client, paths, concurrency: int) -> float:
+    queue = list(reversed(paths))
+
+    async def worker():
+        while queue:
+            await client.get(queue.pop())
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return len(paths) / (time.perf_counter() - started)
+
+
+async def run(args):
+    import main
+    from core.email_verification import get_email_verifier
+
+    main.app.dependency_overrides[get_email_verifier] = StubEmailVerifier
+    middleware = next(entry for entry in main.app.user_middleware if entry.cls is MetricsMiddleware)
+    max_user_id, max_post_id = dataset_bounds()
+    rng = random.Random(42)
+    throughput = {False: [], True: []}
+    transport = httpx.ASGITransport(app=main.app)
+    headers = {'Accept-Encoding': 'identity'}
+    async with httpx.AsyncClient(transport=transport, base_url='http://benchmark', headers=headers) as client:
+        # One unmeasured pass fills the caches and compiles the statements.
+        await drive(client, request_mix(args.requests, max_user_id, max_post_id, rng), args.concurrency)
+        for round_number in range(args.rounds):
+            paths = request_mix(args.requests, max_user_id, max_post_id, rng)
+            # Alternate which side goes first so neither always runs warmer.
+            for instrumented in (False, True) if round_number % 2 == 0 else (True, False):
+                set_instrumented(main.app, instrumented, middleware)
+                throughput[instrumented].append(await drive(client, paths, args.concurrency))
+    set_instrumented(main.app, True, middleware)
+
+    overhead = statistics.median(plain / measured - 1 for plain, measured in zip(throughput[False], throughput[True]))
+    print(f'{"":>14} {"median req/s":>13} {"min":>9} {"max":>9}')
+    for label, samples in (('uninstrumented', throughput[False]), ('instrumented', throughput[True])):
+        print(f'{label:>14} {statistics.median(samples):>13.1f} {min(samples):>9.1f} {max(samples):>9.1f}')
+    print(f'overhead: {overhead * 100:+.1f}% (median per-round uninstrumented / instrumented throughput - 1)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=500, help='Requests per side and round')
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(run(args))
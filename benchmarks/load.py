@@ -0,0 +1,233 @@
+"""Mixed-scenario load driver for the API.
+
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.seed
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.load --duration 30 --concurrency 32
+
+By default the app is driven in-process through httpx's ASGI transport, so no
+server or network is needed, the email verifier is replaced with a stub and
+SQL statements are attributed to the endpoint that issued them. With
+``--base-url`` the same scenarios run against a live server instead (query
+counts are then not available). Results are printed and written as JSON; see
+benchmarks.compare for diffing two runs.
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import httpx
+from sqlalchemy import event, func, select
+
+from benchmarks.seed import SEED_PASSWORD
+from core.database import SessionLocal, async_engine, engine
+from db.models import Post, User
+
+SCENARIOS = {
+    'login_storm': 1,
+    'feed_read': 5,
+    'like_burst': 2,
+    'profile_read': 3,
+}
+
+current_endpoint = contextvars.ContextVar('current_endpoint', default=None)
+
+
+class StubEmailVerifier:
+    async def verify(self, email: str) -> bool:
+        return True
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.queries = defaultdict(int)
+
+    def count_query(self, conn, cursor, statement, parameters, context, executemany):
+        endpoint = current_endpoint.get()
+        if endpoint is not None:
+            self.queries[endpoint] += 1
+
+    async def request(self, client, endpoint, method, url, **kwargs):
+        token = current_endpoint.set(endpoint)
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        finally:
+            current_endpoint.reset(token)
+        self.latencies[endpoint].append(time.perf_counter() - started)
+        if response.status_code >= 500 or response.status_code == 429:
+            self.errors[endpoint] += 1
+        return response
+
+    def report(self, elapsed: float, track_queries: bool):
+        endpoints = {}
+        for endpoint, samples in sorted(self.latencies.items()):
+            samples = sorted(samples)
+            endpoints[endpoint] = {
+                'requests': len(samples),
+                'errors': self.errors[endpoint],
+                'throughput_rps': len(samples) / elapsed,
+                'p50_ms': percentile(samples, 50) * 1000,
+                'p95_ms': percentile(samples, 95) * 1000,
+                'p99_ms': percentile(samples, 99) * 1000,
+                'queries_per_request': self.queries[endpoint] / len(samples) if track_queries else None,
+            }
+        total = sum(len(samples) for samples in self.latencies.values())
+        return {'elapsed_s': elapsed, 'requests': total, 'throughput_rps': total / elapsed, 'endpoints': endpoints}
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    index = max(int(round(pct / 100 * len(samples))) - 1, 0)
+    return samples[min(index, len(samples) - 1)]
+
+
+def dataset_bounds():
+    with SessionLocal() as db:
+        return db.scalar(select(func.max(User.id))), db.scalar(select(func.max(Post.id)))
+
+
+class Scenarios:
+    def __init__(self, recorder, rng, max_user_id, max_post_id):
+        self.recorder = recorder
+        self.rng = rng
+        self.max_user_id = max_user_id
+        self.max_post_id = max_post_id
+        self.tokens = {}
+
+    async def login(self, client, user_id):
+        response = await self.recorder.request(
+            client, 'POST /auth/login', 'POST', '/auth/login',
+            data={'username': f'user{user_id}', 'password': SEED_PASSWORD},
+        )
+        if response.status_code == 200:
+            self.tokens[user_id] = response.json()['access_token']
+        return self.tokens.get(user_id)
+
+    async def auth_headers(self, client, user_id):
+        token = self.tokens.get(user_id) or await self.login(client, user_id)
+        return {'Authorization': f'Bearer {token}'} if token else {}
+
+    async def login_storm(self, client):
+        await self.login(client, self.rng.randint(1, self.max_user_id))
+
+    async def feed_read(self, client):
+        after = None
+        for _ in range(self.rng.randint(1, 3)):
+            params = {'limit': 50}
+            if after is not None:
+                params['after'] = after
+            response = await self.recorder.request(client, 'GET /posts/', 'GET', '/posts/', params=params)
+            after = response.json().get('next_cursor') if response.status_code == 200 else None
+            if after is None:
+                break
+
+    async def like_burst(self, client):
+        # A small pool of hot posts, so concurrent likes contend like a viral spike does.
+        post_id = self.rng.randint(1, min(self.max_post_id, 20))
+        for _ in range(self.rng.randint(1, 5)):
+            headers = await self.auth_headers(client, self.rng.randint(1, self.max_user_id))
+            await self.recorder.request(
+                client, 'POST /posts/{post_id}/like', 'POST', f'/posts/{post_id}/like', headers=headers
+            )
+            await self.recorder.request(
+                client, 'POST /posts/{post_id}/dislike', 'POST', f'/posts/{post_id}/dislike', headers=headers
+            )
+
+    async def profile_read(self, client):
+        user_id = self.rng.randint(1, self.max_user_id)
+        await self.recorder.request(
+            client, 'GET /auth/profile/{user_id}', 'GET', f'/auth/profile/{user_id}'
+        )
+
+
+async def worker(scenarios, client, deadline, weights):
+    names = list(weights)
+    while time.perf_counter() < deadline:
+        name = scenarios.rng.choices(names, weights=[weights[name] for name in names])[0]
+        await getattr(scenarios, name)(client)
+
+
+async def run(args):
+    max_user_id, max_post_id = dataset_bounds()
+    if not max_user_id or not max_post_id:
+        raise SystemExit('The database is empty, run python -m benchmarks.seed first')
+
+    recorder = Recorder()
+    weights = {name: weight for name, weight in SCENARIOS.items() if name in args.scenarios}
+    track_queries = args.base_url is None
+    if track_queries:
+        import main
+        from core.email_verification import get_email_verifier
+
+        main.app.dependency_overrides[get_email_verifier] = StubEmailVerifier
+        transport = httpx.ASGITransport(app=main.app)
+        base_url = 'http://benchmark'
+        for target in (engine, async_engine.sync_engine):
+            event.listen(target, 'before_cursor_execute', recorder.count_query)
+    else:
+        transport = None
+        base_url = args.base_url
+
+    rng = random.Random(args.seed)
+    scenarios = Scenarios(recorder, rng, max_user_id, max_post_id)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, limits=limits, timeout=30) as client:
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(worker(scenarios, client, deadline, weights) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'config': {
+            'duration_s': args.duration,
+            'concurrency': args.concurrency,
+            'scenarios': weights,
+            'seed': args.seed,
+            'target': args.base_url or 'in-process',
+            'database': engine.url.render_as_string(hide_password=True),
+            'db_mode': os.getenv('DB_MODE', 'async'),
+        },
+        'dataset': {'users': max_user_id, 'posts': max_post_id},
+        **recorder.report(elapsed, track_queries),
+    }
+
+
+def print_report(result):
+    print(f'{result["requests"]} requests in {result["elapsed_s"]:.1f}s, {result["throughput_rps"]:.1f} req/s')
+    print(f'{"endpoint":<32} {"reqs":>7} {"err":>5} {"rps":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"q/req":>6}')
+    for endpoint, stats in result['endpoints'].items():
+        queries = '-' if stats['queries_per_request'] is None else f'{stats["queries_per_request"]:.1f}'
+        print(
+            f'{endpoint:<32} {stats["requests"]:>7} {stats["errors"]:>5} {stats["throughput_rps"]:>8.1f} '
+            f'{stats["p50_ms"]:>8.1f} {stats["p95_ms"]:>8.1f} {stats["p99_ms"]:>8.1f} {queries:>6}'
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--base-url', help='Drive a running server instead of the app in-process')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='JSON results path (default: benchmarks/results/<timestamp>.json)')
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_report(result)
+    output = args.output or os.path.join(
+        os.path.dirname(__file__), 'results', datetime.now().strftime('%Y%m%d-%H%M%S') + '.json'
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f'Results written to {output}')
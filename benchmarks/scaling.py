@@ -0,0 +1,119 @@
+"""Throughput of python -m serve from 1 to N workers.
+
+    DATABASE_URL=postgresql://... python -m benchmarks.seed
+    DATABASE_URL=postgresql://... python -m benchmarks.scaling --workers 1 2 4 8 --duration 30
+
+For each worker count a server is started on a free local port and driven
+over HTTP by ``--clients`` load processes (benchmarks.load --base-url), so
+the load generator doesn't become the single-core bottleneck it would be as
+one process. Efficiency is throughput per worker relative to one worker;
+near 1.0 means linear scaling. Read-only scenarios are the default because
+they scale with cores; like_burst mostly measures row-lock contention on the
+database instead.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.load import SCENARIOS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(base_url: str, server, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f'Server exited with {server.returncode}')
+        try:
+            if httpx.get(base_url + '/stats', timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit('Server did not become ready')
+
+
+def measure(workers: int, args):
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    server = subprocess.Popen(
+        # The read-only scenarios don't depend on cache or revocation state
+        # being shared between workers.
+        [sys.executable, '-m', 'serve', '--workers', str(workers), '--bind', f'127.0.0.1:{port}', '--allow-local-state'],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready(base_url, server)
+        with tempfile.TemporaryDirectory() as results:
+            clients = [
+                subprocess.Popen(
+                    [
+                        sys.executable, '-m', 'benchmarks.load', '--base-url', base_url,
+                        '--duration', str(args.duration), '--concurrency', str(args.concurrency),
+                        '--scenarios', *args.scenarios, '--seed', str(index + 1),
+                        '--output', os.path.join(results, f'{index}.json'),
+                    ],
+                    cwd=ROOT, stdout=subprocess.DEVNULL,
+                )
+                for index in range(args.clients)
+            ]
+            for client in clients:
+                if client.wait() != 0:
+                    raise SystemExit(f'Load client exited with {client.returncode}')
+            reports = []
+            for index in range(args.clients):
+                with open(os.path.join(results, f'{index}.json')) as f:
+                    reports.append(json.load(f))
+    finally:
+        server.terminate()
+        server.wait()
+    requests = sum(report['requests'] for report in reports)
+    errors = sum(stats['errors'] for report in reports for stats in report['endpoints'].values())
+    return {
+        'workers': workers,
+        'requests': requests,
+        'errors': errors,
+        'throughput_rps': sum(report['throughput_rps'] for report in reports),
+        'p95_ms': max(stats['p95_ms'] for report in reports for stats in report['endpoints'].values()),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--concurrency', type=int, default=32, help='Concurrent requests per load client')
+    parser.add_argument('--clients', type=int, default=max(2, (os.cpu_count() or 1) // 2))
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=['feed_read', 'profile_read'])
+    parser.add_argument('--output', help='Write the results as JSON to this path')
+    args = parser.parse_args()
+
+    results = []
+    print(f'{"workers":>7} {"requests":>9} {"errors":>7} {"req/s":>9} {"speedup":>8} {"efficiency":>10} {"worst p95 ms":>13}')
+    for workers in sorted(set(args.workers)):
+        result = measure(workers, args)
+        baseline = results[0] if results else result
+        result['speedup'] = result['throughput_rps'] / baseline['throughput_rps'] * baseline['workers']
+        result['efficiency'] = result['speedup'] / workers
+        results.append(result)
+        print(
+            f'{workers:>7} {result["requests"]:>9} {result["errors"]:>7} {result["throughput_rps"]:>9.1f} '
+            f'{result["speedup"]:>7.2f}x {result["efficiency"]:>10.2f} {result["p95_ms"]:>13.1f}'
+        )
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
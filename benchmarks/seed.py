@@ -0,0 +1,102 @@
+"""Seed a database with a reproducible dataset for the load benchmarks.
+
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.seed --users 1000 --posts 20000
+
+Every user's password is ``SEED_PASSWORD``. Likes and favorites follow a
+power-law so a few posts get most of the traffic, like real feeds do.
+"""
+import argparse
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, text
+
+from core.database import engine
+from core.security import hash_password
+from db.models import Post, User, post_favorite, post_like
+from db.ranking import rebuild
+from db.schema import create, drop
+
+SEED_PASSWORD = 'benchmark-password'
+BATCH_SIZE = 5000
+POST_AGE_DAYS = 30
+
+
+def batched(rows, size=BATCH_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def reaction_pairs(rng, post_authors, user_ids, per_post, alpha):
+    """Yield (user_id, post_id) pairs, at most one per user and post, with a
+    Pareto-distributed number of reactions per post averaging ``per_post``."""
+    scale = per_post * (alpha - 1) / alpha if alpha > 1 else per_post
+    for post_id, author_id in post_authors:
+        count = min(int(scale * rng.paretovariate(alpha)), len(user_ids) - 1)
+        for user_id in rng.sample(user_ids, count):
+            if user_id != author_id:
+                yield user_id, post_id
+
+
+def seed(users: int, posts: int, likes_per_post: float, favorites_per_post: float, alpha: float, random_seed: int):
+    rng = random.Random(random_seed)
+    drop()
+    create()
+
+    # The tables were just recreated, so ids can be assigned up front and the
+    # denormalized counters written together with the posts.
+    user_ids = list(range(1, users + 1))
+    post_authors = [(post_id, rng.choice(user_ids)) for post_id in range(1, posts + 1)]
+    likes = list(reaction_pairs(rng, post_authors, user_ids, likes_per_post, alpha))
+    favorites = list(reaction_pairs(rng, post_authors, user_ids, favorites_per_post, alpha))
+    like_counts = Counter(post_id for _, post_id in likes)
+    favorite_counts = Counter(post_id for _, post_id in favorites)
+
+    now = datetime.utcnow()
+    password = hash_password(SEED_PASSWORD)
+    words = ['alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel', 'india', 'juliet']
+    with engine.begin() as conn:
+        for rows in batched([
+            {
+                'id': user_id, 'username': f'user{user_id}', 'email': f'user{user_id}@example.com',
+                'fullname': f'User {user_id}', 'password': password,
+            }
+            for user_id in user_ids
+        ]):
+            conn.execute(insert(User), rows)
+        for rows in batched([
+            {
+                'id': post_id,
+                'title': ' '.join(rng.choices(words, k=4)),
+                'content': ' '.join(rng.choices(words, k=rng.randint(20, 200))),
+                'author_id': author_id,
+                'like_count': like_counts[post_id],
+                'favorite_count': favorite_counts[post_id],
+                'created_at': now - timedelta(seconds=rng.uniform(0, POST_AGE_DAYS * 86400)),
+            }
+            for post_id, author_id in post_authors
+        ]):
+            conn.execute(insert(Post), rows)
+        for rows in batched([{'user_id': user_id, 'post_id': post_id} for user_id, post_id in likes]):
+            conn.execute(insert(post_like), rows)
+        for rows in batched([{'user_id': user_id, 'fav_id': post_id} for user_id, post_id in favorites]):
+            conn.execute(insert(post_favorite), rows)
+        rebuild(conn)
+        if engine.dialect.name == 'postgresql':
+            for table in ('users', 'posts'):
+                conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"))
+
+    return {'users': users, 'posts': posts, 'likes': len(likes), 'favorites': len(favorites)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--likes-per-post', type=float, default=5)
+    parser.add_argument('--favorites-per-post', type=float, default=1)
+    parser.add_argument('--alpha', type=float, default=1.5, help='Pareto shape; lower values concentrate reactions')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    print(seed(args.users, args.posts, args.likes_per_post, args.favorites_per_post, args.alpha, args.seed))
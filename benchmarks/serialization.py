@@ -0,0 +1,79 @@
+"""Per-item cost of serializing PostResponse lists.
+
+    python -m benchmarks.serialization --sizes 10 1000 100000
+
+"before" is the old path: PostResponse objects built by hand, re-validated by
+FastAPI against the response_model and encoded with the stdlib json module.
+"orjson" is the same re-validation with the ORJSONResponse default class, and
+"after" validates ORM rows once and lets pydantic-core write the JSON bytes,
+as ModelResponse does.
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+from typing import List
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from api.schemas import PostPage, PostResponse
+from core.responses import ModelResponse
+
+
+def make_rows(count: int):
+    author = SimpleNamespace(id=1, username='author', email='author@example.com', fullname='Author')
+    return [
+        SimpleNamespace(
+            id=i, title=f'Post {i}', content='lorem ipsum ' * 20, author=author, like_count=i % 50, favorite_count=i % 7
+        )
+        for i in range(count)
+    ]
+
+
+async def revalidated(field, rows, response_class):
+    models = [
+        PostResponse(
+            id=row.id, title=row.title, content=row.content, author=row.author,
+            like_count=row.like_count, favorite_count=row.favorite_count
+        )
+        for row in rows
+    ]
+    content = await serialize_response(field=field, response_content=models)
+    return response_class(content).body
+
+
+async def single_pass(rows):
+    page = PostPage.model_validate({'posts': rows, 'next_cursor': None}, from_attributes=True)
+    return ModelResponse(page).body
+
+
+async def measure(func, *args, repeat: int):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await func(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+async def run(sizes, repeat: int):
+    field = create_model_field(name='Response', type_=List[PostResponse], mode='serialization')
+    print(f'{"items":>8} {"before us/item":>15} {"orjson us/item":>15} {"after us/item":>14} {"speedup":>8}')
+    for size in sizes:
+        rows = make_rows(size)
+        runs = max(1, repeat if size < 100000 else 1)
+        before = await measure(revalidated, field, rows, JSONResponse, repeat=runs)
+        orjson = await measure(revalidated, field, rows, ORJSONResponse, repeat=runs)
+        after = await measure(single_pass, rows, repeat=runs)
+        per_item = [value / size * 1e6 for value in (before, orjson, after)]
+        print(f'{size:>8} {per_item[0]:>15.2f} {per_item[1]:>15.2f} {per_item[2]:>14.2f} {before / after:>7.1f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.sizes, args.repeat))
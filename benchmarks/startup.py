@@ -0,0 +1,101 @@
+"""Worker cold-start benchmark.
+
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.startup --runs 20
+
+Each run starts a fresh interpreter, the way a new uvicorn/gunicorn worker
+does, and times importing ``main``, running the lifespan startup and serving
+a first request. ``--importtime`` also lists the slowest top-level imports of
+one extra run.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = '''
+import asyncio, json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+import httpx  # the benchmark's own client, kept out of the timed phases
+client_imported = time.perf_counter()
+
+async def first_request():
+    async with main.app.router.lifespan_context(main.app):
+        ready = time.perf_counter()
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://startup') as client:
+            response = await client.get(%r)
+        return ready, time.perf_counter(), response.status_code
+
+ready, served, status_code = asyncio.run(first_request())
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'lifespan_ms': (ready - client_imported) * 1000,
+    'first_request_ms': (served - ready) * 1000,
+    'total_ms': (served - started - (client_imported - imported)) * 1000,
+    'status': status_code,
+}))
+'''
+
+
+def probe(path: str):
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE % path], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(limit: int):
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2]
+        # Depth 1 and 2 are the modules main and its direct imports pull in.
+        if len(name) - len(name.lstrip()) <= 3:
+            rows.append((int(parts[1]) / 1000, name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def summarize(samples, key):
+    values = sorted(sample[key] for sample in samples)
+    return {
+        'median': statistics.median(values),
+        'p95': values[min(int(round(0.95 * len(values))) - 1, len(values) - 1)],
+        'min': values[0],
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--path', default='/stats', help='Endpoint used as the first request')
+    parser.add_argument('--importtime', type=int, default=0, metavar='N', help='Also list the N slowest imports')
+    parser.add_argument('--output', help='Write the summary as JSON to this path')
+    args = parser.parse_args()
+
+    samples = [probe(args.path) for _ in range(args.runs)]
+    result = {
+        'runs': args.runs,
+        'first_request_status': samples[-1]['status'],
+        **{key: summarize(samples, key) for key in ('import_ms', 'lifespan_ms', 'first_request_ms', 'total_ms')},
+    }
+    print(f'{"phase":<18} {"median ms":>10} {"p95 ms":>8} {"min ms":>8}')
+    for key in ('import_ms', 'lifespan_ms', 'first_request_ms', 'total_ms'):
+        print(f'{key[:-3]:<18} {result[key]["median"]:>10.1f} {result[key]["p95"]:>8.1f} {result[key]["min"]:>8.1f}')
+    if args.importtime:
+        print('\nslowest imports (cumulative ms)')
+        for ms, name in slowest_imports(args.importtime):
+            print(f'{ms:>8.1f}  {name}')
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
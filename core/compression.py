@@ -0,0 +1,244 @@
+import gzip
+import hashlib
+import os
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+from core.cache import TTLCache
+
+# Responses smaller than this go out as they are; below roughly a packet the
+# saved bytes don't pay for the CPU.
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+# Server preference among encodings the client accepts equally well. br and
+# zstd are only offered when the brotli and zstandard packages are installed.
+COMPRESSION_ENCODINGS = [
+    name.strip() for name in os.getenv('COMPRESSION_ENCODINGS', 'zstd,br,gzip').split(',') if name.strip()
+]
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+COMPRESSION_BROTLI_LEVEL = int(os.getenv('COMPRESSION_BROTLI_LEVEL', 5))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv('COMPRESSION_ZSTD_LEVEL', 3))
+COMPRESSION_CACHE_SIZE = int(os.getenv('COMPRESSION_CACHE_SIZE', 2000))
+COMPRESSION_CACHE_TTL = float(os.getenv('COMPRESSION_CACHE_TTL', 300))
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+
+def gzip_encoder(level: int):
+    # mtime=0 keeps the output a pure function of the body.
+    return lambda body: gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def brotli_encoder(level: int):
+    import brotli
+
+    return lambda body: brotli.compress(body, quality=level)
+
+
+def zstd_encoder(level: int):
+    import zstandard
+
+    # A ZstdCompressor must not be shared between threads, so each call
+    # gets its own.
+    return lambda body: zstandard.ZstdCompressor(level=level).compress(body)
+
+
+def available_encoders(levels: dict = None):
+    levels = levels or {}
+    factories = {
+        'gzip': (gzip_encoder, levels.get('gzip', COMPRESSION_GZIP_LEVEL)),
+        'br': (brotli_encoder, levels.get('br', COMPRESSION_BROTLI_LEVEL)),
+        'zstd': (zstd_encoder, levels.get('zstd', COMPRESSION_ZSTD_LEVEL)),
+    }
+    encoders = {}
+    for name, (factory, level) in factories.items():
+        try:
+            encoders[name] = factory(level)
+        except ImportError:
+            pass
+    return encoders
+
+
+def negotiate(accept_encoding: str, preference) -> str:
+    """The acceptable encoding with the highest q-value, ties going to the
+    earliest in ``preference``; None when only identity is acceptable."""
+    weights = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            weights[name] = quality
+    best, best_quality = None, 0.0
+    for name in preference:
+        quality = weights.get(name, weights.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+class Compressor:
+    """Encodes response bodies off the event loop and remembers the result.
+
+    Compressed bodies are cached by (encoding, content version): the ETag when
+    the response carries one, which the response cache derives from the body,
+    otherwise a BLAKE2 digest of the body, which costs a small fraction of
+    compressing it. A hot page is therefore compressed once per version and
+    encoding no matter how many clients fetch it."""
+
+    def __init__(self, encoders: dict, preference, min_size: int, cache_size: int, cache_ttl: float):
+        self.encoders = encoders
+        self.preference = [name for name in preference if name in encoders]
+        self.min_size = min_size
+        self.cache = TTLCache(cache_size, cache_ttl)
+        self.responses = dict.fromkeys(self.preference, 0)
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+
+    def encode(self, encoding: str, body: bytes):
+        started = time.perf_counter()
+        compressed = self.encoders[encoding](body)
+        return compressed, time.perf_counter() - started
+
+    async def compress(self, encoding: str, body: bytes, version: bytes = None, cacheable: bool = False) -> bytes:
+        key = None
+        if cacheable:
+            key = (encoding, version or hashlib.blake2b(body, digest_size=16).digest())
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.count(encoding, body, cached)
+                return cached
+        compressed, elapsed = await run_in_threadpool(self.encode, encoding, body)
+        self.cpu_seconds += elapsed
+        if key is not None:
+            self.cache.set(key, compressed)
+        self.count(encoding, body, compressed)
+        return compressed
+
+    def count(self, encoding: str, body: bytes, compressed: bytes):
+        self.responses[encoding] += 1
+        self.bytes_in += len(body)
+        self.bytes_out += len(compressed)
+
+    def stats(self):
+        return {
+            'encodings': self.preference,
+            'min_size': self.min_size,
+            'responses': self.responses,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'ratio': self.bytes_out / self.bytes_in if self.bytes_in else 1.0,
+            'cpu_ms': self.cpu_seconds * 1000,
+            'cache': self.cache.stats(),
+        }
+
+
+compressor = Compressor(
+    available_encoders(), COMPRESSION_ENCODINGS, COMPRESSION_MIN_SIZE, COMPRESSION_CACHE_SIZE, COMPRESSION_CACHE_TTL
+)
+
+
+def encoded_etag(etag: bytes, encoding: str) -> bytes:
+    # Each encoding of a body is a representation of its own and gets its own
+    # strong validator: the ETag of the body with the encoding appended.
+    return etag[:-1] + b'-' + encoding.encode() + b'"' if etag.endswith(b'"') else etag
+
+
+def decode_if_none_match(headers, encoding: str):
+    """The request headers with validators of the ``encoding`` representation
+    turned back into the ETags the app issued, and whether there were any."""
+    suffix = b'-' + encoding.encode() + b'"'
+    decoded, found = [], False
+    for name, value in headers:
+        if name == b'if-none-match':
+            candidates = []
+            for candidate in value.split(b','):
+                candidate = candidate.strip()
+                if candidate.endswith(suffix):
+                    candidate = candidate[:-len(suffix)] + b'"'
+                    found = True
+                candidates.append(candidate)
+            value = b', '.join(candidates)
+        decoded.append((name, value))
+    return decoded, found
+
+
+def with_etag(headers, etag: bytes):
+    return [(name, etag if name.lower() == b'etag' else value) for name, value in headers]
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware that compresses complete JSON and text bodies the
+    client accepts in a better encoding. Streamed responses (NDJSON) pass
+    through untouched, since they would have to be buffered to compress."""
+
+    def __init__(self, app, compressor: Compressor = compressor):
+        self.app = app
+        self.compressor = compressor
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        accept_encoding = ''
+        for name, value in scope['headers']:
+            if name == b'accept-encoding':
+                accept_encoding = value.decode('latin-1')
+                break
+        encoding = negotiate(accept_encoding, self.compressor.preference) if accept_encoding else None
+        if encoding is None:
+            return await self.app(scope, receive, send)
+        # The app compares If-None-Match with the ETags it issued; a 304 for a
+        # validator of the encoded representation has to carry that one back.
+        # The scope is changed in place: routing records the matched route on
+        # it, and MetricsMiddleware reads the route from the same dict.
+        scope['headers'], revalidating_encoded = decode_if_none_match(scope['headers'], encoding)
+
+        start = None
+
+        async def compressing_send(message):
+            nonlocal start
+            if message['type'] == 'http.response.start':
+                start = message
+                return
+            if start is None:
+                return await send(message)
+            pending, start = start, None
+            body = message.get('body', b'')
+            headers = dict((name.lower(), value) for name, value in pending.get('headers', []))
+            content_type = headers.get(b'content-type', b'').decode('latin-1')
+            etag = headers.get(b'etag')
+            if pending['status'] == 304 and etag is not None and revalidating_encoded:
+                pending = dict(pending, headers=with_etag(pending['headers'], encoded_etag(etag, encoding)))
+            if (
+                message.get('more_body')
+                or len(body) < self.compressor.min_size
+                or b'content-encoding' in headers
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            ):
+                await send(pending)
+                return await send(message)
+
+            cacheable = scope['method'] in ('GET', 'HEAD') and pending['status'] == 200
+            compressed = await self.compressor.compress(encoding, body, etag, cacheable)
+            raw_headers = [
+                (name, value) for name, value in pending.get('headers', [])
+                if name.lower() not in (b'content-length', b'vary')
+            ]
+            if etag is not None:
+                raw_headers = with_etag(raw_headers, encoded_etag(etag, encoding))
+            vary = headers.get(b'vary')
+            raw_headers.append((b'vary', vary + b', Accept-Encoding' if vary else b'Accept-Encoding'))
+            raw_headers.append((b'content-encoding', encoding.encode()))
+            raw_headers.append((b'content-length', str(len(compressed)).encode()))
+            await send(dict(pending, headers=raw_headers))
+            await send(dict(message, body=compressed))
+
+        await self.app(scope, receive, compressing_send)
@@ -0,0 +1,140 @@
+import os
+import time
+
+from core.cache import TTLCache
+
+EMAIL_VERIFIER_URL = os.getenv('EMAIL_VERIFIER_URL', 'https://api.emailhunter.co/v2/email-verifier')
+EMAIL_VERIFIER_API_KEY = os.getenv('EMAIL_VERIFIER_API_KEY', 'fb79abfb32d8042d0b5273e47d2a5fbe3f4091f4')
+EMAIL_VERIFIER_TIMEOUT = float(os.getenv('EMAIL_VERIFIER_TIMEOUT', 3))
+EMAIL_VERIFIER_MAX_CONNECTIONS = int(os.getenv('EMAIL_VERIFIER_MAX_CONNECTIONS', 20))
+EMAIL_VERIFIER_CACHE_SIZE = int(os.getenv('EMAIL_VERIFIER_CACHE_SIZE', 50000))
+EMAIL_VERIFIER_VALID_TTL = float(os.getenv('EMAIL_VERIFIER_VALID_TTL', 24 * 3600))
+EMAIL_VERIFIER_INVALID_TTL = float(os.getenv('EMAIL_VERIFIER_INVALID_TTL', 3600))
+EMAIL_VERIFIER_BREAKER_THRESHOLD = int(os.getenv('EMAIL_VERIFIER_BREAKER_THRESHOLD', 5))
+EMAIL_VERIFIER_BREAKER_RESET = float(os.getenv('EMAIL_VERIFIER_BREAKER_RESET', 30))
+# What register does while the provider is unreachable: 'allow' or 'deny' the address.
+EMAIL_VERIFIER_FAILURE_POLICY = os.getenv('EMAIL_VERIFIER_FAILURE_POLICY', 'allow')
+
+
+class CircuitBreaker:
+    """Opens after ``threshold`` consecutive failures and lets a single probe
+    through once ``reset_after`` seconds have passed."""
+
+    def __init__(self, threshold: int, reset_after: float):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        state = self.state
+        if state == 'half_open':
+            # Re-arm the timer so concurrent requests don't all probe at once.
+            self.opened_at = time.monotonic()
+            return True
+        return state == 'closed'
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class EmailVerifier:
+    def __init__(
+        self,
+        url: str = EMAIL_VERIFIER_URL,
+        api_key: str = EMAIL_VERIFIER_API_KEY,
+        timeout: float = EMAIL_VERIFIER_TIMEOUT,
+        failure_policy: str = EMAIL_VERIFIER_FAILURE_POLICY,
+    ):
+        self.url = url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.accept_on_failure = failure_policy == 'allow'
+        self.client = None
+        self.emails = TTLCache(EMAIL_VERIFIER_CACHE_SIZE, EMAIL_VERIFIER_VALID_TTL)
+        self.rejected_domains = TTLCache(EMAIL_VERIFIER_CACHE_SIZE, EMAIL_VERIFIER_INVALID_TTL)
+        self.breaker = CircuitBreaker(EMAIL_VERIFIER_BREAKER_THRESHOLD, EMAIL_VERIFIER_BREAKER_RESET)
+        self.degraded = 0
+
+    def get_client(self):
+        if self.client is None:
+            # httpx is a noticeable share of import time and only needed once
+            # someone registers, so it is imported on first use.
+            import httpx
+
+            self.client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=EMAIL_VERIFIER_MAX_CONNECTIONS,
+                    max_keepalive_connections=EMAIL_VERIFIER_MAX_CONNECTIONS,
+                ),
+            )
+        return self.client
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def lookup(self, email: str) -> dict:
+        response = await self.get_client().get(self.url, params={'email': email, 'api_key': self.api_key})
+        response.raise_for_status()
+        return response.json().get('data') or {}
+
+    async def verify(self, email: str) -> bool:
+        email = email.strip().lower()
+        domain = email.rpartition('@')[2]
+        if self.rejected_domains.get(domain):
+            return False
+        cached = self.emails.get(email)
+        if cached is not None:
+            return cached
+
+        if not self.breaker.allow():
+            self.degraded += 1
+            return self.accept_on_failure
+        import httpx
+
+        try:
+            data = await self.lookup(email)
+        except (httpx.HTTPError, ValueError):
+            self.breaker.record_failure()
+            self.degraded += 1
+            return self.accept_on_failure
+        self.breaker.record_success()
+
+        if data.get('disposable') or data.get('mx_records') is False:
+            self.rejected_domains.set(domain, True)
+        valid = data.get('status') == 'valid'
+        self.emails.set(email, valid, ttl=None if valid else EMAIL_VERIFIER_INVALID_TTL)
+        return valid
+
+    def stats(self):
+        return {
+            'breaker': self.breaker.state,
+            'consecutive_failures': self.breaker.failures,
+            'degraded': self.degraded,
+            'emails': self.emails.stats(),
+            'rejected_domains': self.rejected_domains.stats(),
+        }
+
+
+email_verifier = EmailVerifier()
+
+
+def get_email_verifier():
+    return email_verifier
@@ -0,0 +1,87 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi import HTTPException, status
+
+from core.security import hash_password, verify_password
+
+HASH_POOL_SIZE = int(os.getenv('HASH_POOL_SIZE', os.cpu_count() or 1))
+HASH_QUEUE_SIZE = int(os.getenv('HASH_QUEUE_SIZE', HASH_POOL_SIZE * 8))
+HASH_RETRY_AFTER = int(os.getenv('HASH_RETRY_AFTER', 1))
+# Forking a process that already runs an event loop, database threads and
+# driver connections can leave the child deadlocked on a lock one of them
+# held; forkserver (spawn where it is missing) starts workers from a clean
+# process.
+HASH_POOL_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+class HashPool:
+    """Runs bcrypt in worker processes so it never holds the GIL of the
+    request loop. At most ``max_pending`` calls are admitted at once; the rest
+    are rejected with 503 instead of piling up behind a login burst."""
+
+    def __init__(self, workers: int, max_pending: int, retry_after: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self.executor = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def start(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context(HASH_POOL_START_METHOD)
+            )
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    async def run(self, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail='Authentication service is busy, try again later',
+                headers={'Retry-After': str(self.retry_after)}
+            )
+        self.start()
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.pending -= 1
+            self.completed += 1
+            self.latency_total += elapsed
+            self.latency_max = max(self.latency_max, elapsed)
+
+    async def hash(self, password: str) -> str:
+        return await self.run(hash_password, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self.run(verify_password, password, hashed_password)
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'in_flight': min(self.pending, self.workers),
+            'queue_depth': max(self.pending - self.workers, 0),
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'latency_avg_ms': self.latency_total / self.completed * 1000 if self.completed else 0.0,
+            'latency_max_ms': self.latency_max * 1000,
+        }
+
+
+hash_pool = HashPool(HASH_POOL_SIZE, HASH_QUEUE_SIZE, HASH_RETRY_AFTER)
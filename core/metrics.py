@@ -0,0 +1,272 @@
+import bisect
+import contextvars
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 0))
+SLOW_REQUEST_MAX_STATEMENTS = 50
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+BATCH_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+logger = logging.getLogger('api.slow_requests')
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = labelnames
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            items = [(labels, list(counts), total, count) for labels, (counts, total, count) in self.series.items()]
+        for labels, counts, total, count in sorted(items):
+            base = format_labels(self.labelnames, labels)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{format_labels(self.labelnames + ("le",), labels + (le,))} {cumulative}')
+            lines.append(f'{self.name}_sum{base} {total}')
+            lines.append(f'{self.name}_count{base} {count}')
+        return lines
+
+
+def escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in zip(names, values)) + '}'
+
+
+REQUEST_LABELS = ('method', 'route')
+
+request_duration = Histogram(
+    'http_request_duration_seconds', 'Request latency by route and status.', LATENCY_BUCKETS,
+    REQUEST_LABELS + ('status',)
+)
+request_size = Histogram('http_request_size_bytes', 'Request body size.', SIZE_BUCKETS, REQUEST_LABELS)
+response_size = Histogram('http_response_size_bytes', 'Response body size.', SIZE_BUCKETS, REQUEST_LABELS)
+db_statements = Histogram(
+    'db_statements_per_request', 'SQL statements issued per request.', COUNT_BUCKETS, REQUEST_LABELS
+)
+db_statement_duration = Histogram(
+    'db_statement_duration_seconds', 'Duration of individual SQL statements.', LATENCY_BUCKETS, REQUEST_LABELS
+)
+db_pool_wait = Histogram(
+    'db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection.', LATENCY_BUCKETS, REQUEST_LABELS
+)
+
+write_behind_flush_duration = Histogram(
+    'write_behind_flush_duration_seconds', 'Time to apply one batch of queued reactions.', LATENCY_BUCKETS
+)
+write_behind_batch_size = Histogram(
+    'write_behind_batch_size', 'Queued reactions applied per flush.', BATCH_BUCKETS
+)
+
+HISTOGRAMS = [
+    request_duration, request_size, response_size, db_statements, db_statement_duration, db_pool_wait,
+    write_behind_flush_duration, write_behind_batch_size,
+]
+
+
+BACKGROUND_LABELS = ('', 'background')
+
+
+class RequestStats:
+    __slots__ = ('scope', 'statements', 'sql_seconds', 'captured')
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.captured = [] if SLOW_REQUEST_MS else None
+
+    @property
+    def labels(self):
+        # Starlette stores the matched route in the scope during routing, which
+        # happens before the endpoint issues any SQL.
+        route = self.scope.get('route')
+        return self.scope['method'], route.path if route is not None else 'unmatched'
+
+
+current_request = contextvars.ContextVar('current_request', default=None)
+
+
+def current_labels():
+    stats = current_request.get()
+    return stats.labels if stats is not None else BACKGROUND_LABELS
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    stats = current_request.get()
+    if stats is None:
+        db_statement_duration.observe(BACKGROUND_LABELS, elapsed)
+        return
+    stats.statements += 1
+    stats.sql_seconds += elapsed
+    if stats.captured is not None and len(stats.captured) < SLOW_REQUEST_MAX_STATEMENTS:
+        stats.captured.append((elapsed, statement))
+    db_statement_duration.observe(stats.labels, elapsed)
+
+
+def handle_error(context):
+    started = context.connection.info.get('query_started') if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def instrument_engine(engine):
+    engine = getattr(engine, 'sync_engine', engine)
+    if event.contains(engine, 'before_cursor_execute', before_cursor_execute):
+        return
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+    event.listen(engine, 'handle_error', handle_error)
+
+
+class CheckoutTimer:
+    """Pool mixin that records how long each checkout waited for a connection."""
+
+    checkouts = 0
+    timeouts = 0
+    wait_total = 0.0
+    wait_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            db_pool_wait.observe(current_labels(), waited)
+
+    def wait_stats(self):
+        return {
+            'checkouts': self.checkouts,
+            'checkout_timeouts': self.timeouts,
+            'wait_avg_ms': self.wait_total / self.checkouts * 1000 if self.checkouts else 0.0,
+            'wait_max_ms': self.wait_max * 1000,
+        }
+
+
+class TimedQueuePool(CheckoutTimer, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(CheckoutTimer, AsyncAdaptedQueuePool):
+    pass
+
+
+TIMED_POOLS = {QueuePool: TimedQueuePool, AsyncAdaptedQueuePool: TimedAsyncAdaptedQueuePool}
+
+
+def timed_pool_class(pool_class):
+    return TIMED_POOLS.get(pool_class, pool_class)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so it adds no task or buffering to the request and
+    the context variable it sets is visible to the SQL hooks above."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        sizes = [0, 0]
+        status_code = [500]
+        started = time.perf_counter()
+
+        async def counting_receive():
+            message = await receive()
+            sizes[0] += len(message.get('body', b''))
+            return message
+
+        async def counting_send(message):
+            if message['type'] == 'http.response.start':
+                status_code[0] = message['status']
+            elif message['type'] == 'http.response.body':
+                sizes[1] += len(message.get('body', b''))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            current_request.reset(token)
+            elapsed = time.perf_counter() - started
+            labels = stats.labels
+            request_duration.observe(labels + (status_code[0],), elapsed)
+            request_size.observe(labels, sizes[0])
+            response_size.observe(labels, sizes[1])
+            db_statements.observe(labels, stats.statements)
+            if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+                log_slow_request(labels, status_code[0], elapsed, stats)
+
+
+def log_slow_request(labels, status_code, elapsed, stats):
+    statements = '\n'.join(f'  {seconds * 1000:.1f} ms  {statement}' for seconds, statement in stats.captured)
+    logger.warning(
+        '%s %s -> %s took %.1f ms, %d SQL statements in %.1f ms\n%s',
+        labels[0], labels[1], status_code, elapsed * 1000, stats.statements, stats.sql_seconds * 1000, statements
+    )
+
+
+def render_gauges(prefix: str, values: dict):
+    lines = []
+    for key, value in values.items():
+        name = f'{prefix}_{key}'
+        if isinstance(value, dict):
+            lines.extend(render_gauges(name, value))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {value}')
+    return lines
+
+
+def render(gauges: dict = None) -> str:
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    lines.extend(render_gauges('app', gauges or {}))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,44 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from core.database import async_engine, engine
+
+
+class QueryCounter:
+    """Records every statement sent to the given engines while active."""
+
+    def __init__(self, *engines):
+        self.engines = [getattr(e, 'sync_engine', e) for e in engines or (engine, async_engine)]
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        for e in self.engines:
+            event.listen(e, 'before_cursor_execute', self.record)
+        return self
+
+    def __exit__(self, *exc_info):
+        for e in self.engines:
+            event.remove(e, 'before_cursor_execute', self.record)
+
+
+@contextmanager
+def assert_max_queries(limit: int, *engines):
+    """Fail when the wrapped block, e.g. one TestClient call, issues more than
+    ``limit`` SQL statements::
+
+        with assert_max_queries(2):
+            client.get('/posts/')
+    """
+    with QueryCounter(*engines) as counter:
+        yield counter
+    if counter.count > limit:
+        statements = '\n'.join(counter.statements)
+        raise AssertionError(f'Expected at most {limit} queries, got {counter.count}:\n{statements}')
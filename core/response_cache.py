@@ -0,0 +1,141 @@
+import hashlib
+import itertools
+import os
+
+from fastapi import Request, Response
+
+from core.cache import TTLCache
+
+RESPONSE_CACHE_BACKEND = os.getenv('RESPONSE_CACHE_BACKEND', 'memory')
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', 300))
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 10000))
+RESPONSE_CACHE_VERSIONS_SIZE = int(os.getenv('RESPONSE_CACHE_VERSIONS_SIZE', RESPONSE_CACHE_SIZE * 10))
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+
+
+class MemoryBackend:
+    """Default backend: an LRU of entries plus an LRU of versions.
+
+    Versions expire like entries, so neither grows without bound, and a
+    version that is gone must not bring back an old entry. Entries under an
+    older version were stored before the version last changed, so they
+    expire before it does; and since versions are drawn from one increasing
+    counter, a version that starts again from 0 never repeats a number an
+    entry may still be stored under. Evicting a version for space is the one
+    case that could revive an entry, so it drops the entries too.
+
+    Any object with the same four coroutines can be used instead; RedisBackend
+    maps them one-to-one onto GET/SET EX/INCR/DEL."""
+
+    def __init__(self, maxsize: int, versions_size: int):
+        self.entries = TTLCache(maxsize, RESPONSE_CACHE_TTL)
+        self.versions = TTLCache(versions_size, RESPONSE_CACHE_TTL)
+        self.clock = itertools.count(1)
+
+    async def get(self, key: str):
+        if key.startswith('version:'):
+            return self.versions.get(key)
+        return self.entries.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        self.entries.set(key, value, ttl=ttl)
+
+    async def incr(self, key: str) -> int:
+        version = next(self.clock)
+        evictions = self.versions.evictions
+        self.versions.set(key, version)
+        if self.versions.evictions != evictions:
+            self.entries.clear()
+        return version
+
+    async def delete(self, key: str):
+        self.entries.pop(key)
+        self.versions.pop(key, None)
+
+    def stats(self):
+        return dict(self.entries.stats(), versions=self.versions.stats())
+
+
+class RedisBackend:
+    def __init__(self, client):
+        self.client = client
+
+    async def get(self, key: str):
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        await self.client.set(key, value, ex=max(int(ttl), 1))
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(key)
+
+    async def delete(self, key: str):
+        await self.client.delete(key)
+
+    def stats(self):
+        return {'backend': 'redis'}
+
+
+def create_backend(name: str = RESPONSE_CACHE_BACKEND):
+    if name == 'redis':
+        import redis.asyncio
+
+        return RedisBackend(redis.asyncio.from_url(REDIS_URL))
+    return MemoryBackend(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_VERSIONS_SIZE)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    candidates = [candidate.strip().removeprefix('W/') for candidate in header.split(',')]
+    return '*' in candidates or etag in candidates
+
+
+class ResponseCache:
+    """Caches serialized JSON bodies under a key that embeds the version of
+    every object the body depends on. Writers bump versions instead of finding
+    and deleting entries, and a strong ETag of the body is stored alongside it
+    so a matching If-None-Match is answered with 304 straight from the cache."""
+
+    def __init__(self, backend, ttl: float = RESPONSE_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.not_modified = 0
+
+    async def version(self, kind: str, ident: int) -> int:
+        return int(await self.backend.get(f'version:{kind}:{ident}') or 0)
+
+    async def key(self, kind: str, ident: int) -> str:
+        return f'response:{kind}:{ident}:v{await self.version(kind, ident)}'
+
+    async def invalidate(self, kind: str, *idents):
+        for ident in idents:
+            if ident is not None:
+                await self.backend.incr(f'version:{kind}:{ident}')
+
+    def respond(self, request: Request, etag: str, body: bytes) -> Response:
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if etag_matches(request, etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type='application/json', headers=headers)
+
+    async def get(self, key: str, request: Request):
+        cached = await self.backend.get(key)
+        if cached is None:
+            return None
+        etag, _, body = cached.partition(b'\n')
+        return self.respond(request, etag.decode(), body)
+
+    async def store(self, key: str, request: Request, model) -> Response:
+        body = model.model_dump_json().encode()
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        await self.backend.set(key, etag.encode() + b'\n' + body, self.ttl)
+        return self.respond(request, etag, body)
+
+    def stats(self):
+        return dict(self.backend.stats(), not_modified=self.not_modified)
+
+
+response_cache = ResponseCache(create_backend())
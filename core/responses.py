@@ -0,0 +1,18 @@
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+class ModelResponse(ORJSONResponse):
+    """Returns an already validated model as JSON.
+
+    FastAPI dumps a returned model back to a dict and validates it again against
+    ``response_model`` before encoding it. Handlers that build the schema
+    themselves return it wrapped in this class instead, so it is validated once
+    and serialized straight to bytes by pydantic-core."""
+
+    def render(self, content) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.model_dump_json().encode()
+        if isinstance(content, list) and all(isinstance(item, BaseModel) for item in content):
+            return b'[' + b','.join(item.model_dump_json().encode() for item in content) + b']'
+        return super().render(content)
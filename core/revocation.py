@@ -0,0 +1,83 @@
+import heapq
+import os
+import time
+
+from fastapi import HTTPException, status
+
+TOKEN_REVOCATION_BACKEND = os.getenv('TOKEN_REVOCATION_BACKEND', 'memory')
+TOKEN_REVOCATION_SIZE = int(os.getenv('TOKEN_REVOCATION_SIZE', 100000))
+TOKEN_REVOCATION_RETRY_AFTER = int(os.getenv('TOKEN_REVOCATION_RETRY_AFTER', 60))
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+
+
+class MemoryRevocationStore:
+    """Revoked token ids, each kept only until the token would have expired
+    anyway, so the set holds at most one token lifetime of logouts.
+
+    revoke() returns False when the id was already revoked, which makes
+    refresh tokens single-use. The set is per process: with several workers
+    use RedisRevocationStore, which has the same two coroutines. A live entry
+    is never evicted, since that would make its token valid again; once
+    ``maxsize`` unexpired ids are held, revoke() answers 503 and the refresh
+    or logout is retried later."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.revoked = {}
+        self.expiry = []
+        self.rejected = 0
+
+    def purge(self):
+        now = time.time()
+        while self.expiry and self.expiry[0][0] <= now:
+            _, jti = heapq.heappop(self.expiry)
+            self.revoked.pop(jti, None)
+
+    async def revoke(self, jti: str, expires_at: float) -> bool:
+        self.purge()
+        if jti in self.revoked:
+            return False
+        if len(self.revoked) >= self.maxsize:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail='Too many revoked tokens, try again later',
+                headers={'Retry-After': str(TOKEN_REVOCATION_RETRY_AFTER)}
+            )
+        self.revoked[jti] = expires_at
+        heapq.heappush(self.expiry, (expires_at, jti))
+        return True
+
+    async def is_revoked(self, jti: str) -> bool:
+        return jti in self.revoked
+
+    def stats(self):
+        return {'size': len(self.revoked), 'maxsize': self.maxsize, 'rejected': self.rejected}
+
+
+class RedisRevocationStore:
+    def __init__(self, client):
+        self.client = client
+
+    async def revoke(self, jti: str, expires_at: float) -> bool:
+        ttl = int(expires_at - time.time()) + 1
+        if ttl <= 0:
+            return False
+        return bool(await self.client.set(f'revoked:{jti}', 1, ex=ttl, nx=True))
+
+    async def is_revoked(self, jti: str) -> bool:
+        return bool(await self.client.exists(f'revoked:{jti}'))
+
+    def stats(self):
+        return {'backend': 'redis'}
+
+
+def create_store(name: str = TOKEN_REVOCATION_BACKEND):
+    if name == 'redis':
+        import redis.asyncio
+
+        return RedisRevocationStore(redis.asyncio.from_url(REDIS_URL))
+    return MemoryRevocationStore(TOKEN_REVOCATION_SIZE)
+
+
+revoked_tokens = create_store()
@@ -1,8 +1,9 @@
+import uuid
 from datetime import datetime, timedelta
-from passlib.context import CryptContext
 from jose import jwt, JWTError
 from fastapi import Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 from core.database import get_db
 from db.models import User
@@ -14,11 +15,9 @@ REFRESH_TOKEN_EXPIRE_DAYS = 7
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
 
-
-def get_user(username: str, db: Session = Depends(get_db)):
-    user = db.query(User).get(username)
+async def get_user(username: str, db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(User).where(User.username == username))
     if user:
         return user
     else:
@@ -27,14 +26,14 @@ def get_user(username: str, db: Session = Depends(get_db)):
 
 def verify_password(plain_password, hashed_password):
     password_byte_enc = plain_password.encode('utf-8')
-    return bcrypt.checkpw(password = password_byte_enc , hashed_password = hashed_password)
+    return bcrypt.checkpw(password = password_byte_enc , hashed_password = hashed_password.encode('utf-8'))
 
 
-def authentificate_user(username: str, password: str):
-    user = get_user(username)
+async def authentificate_user(username: str, password: str, db: AsyncSession):
+    user = await get_user(username, db)
     if not user:
         return False
-    if not verify_password(password, user["hashed_password"]):
+    if not verify_password(password, user.password):
         return False
     return user
 
@@ -43,19 +42,22 @@ def hash_password(password):
     pwd_bytes = password.encode('utf-8')
     salt = bcrypt.gensalt()
     hashed_password = bcrypt.hashpw(password=pwd_bytes, salt=salt)
-    return hashed_password
+    return hashed_password.decode('utf-8')
+
+
+get_password_hash = hash_password
 
 
 def create_access_token(user_id: int, expires_minutes: int = ACCESS_TOKEN_EXPIRE_MINUTES):
     expire = datetime.utcnow() + timedelta(minutes=expires_minutes)
-    payload = {"sub": str(user_id), "exp": expire}
+    payload = {"sub": str(user_id), "exp": expire, "jti": uuid.uuid4().hex, "type": "access"}
     encoded_jwt = jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
 def create_refresh_token(user_id: int, expires_days: int = REFRESH_TOKEN_EXPIRE_DAYS):
     expire = datetime.utcnow() + timedelta(days=expires_days)
-    payload = {"sub": str(user_id), "exp": expire, "type": "refresh"}
+    payload = {"sub": str(user_id), "exp": expire, "jti": uuid.uuid4().hex, "type": "refresh"}
     encoded_jwt = jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
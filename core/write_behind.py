@@ -0,0 +1,275 @@
+import asyncio
+import logging
+import os
+import time
+from collections import Counter
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+
+from core.database import insert_ignore, new_session
+from core.metrics import write_behind_batch_size, write_behind_flush_duration
+from core.response_cache import response_cache
+from db.models import Post, post_favorite, post_like
+from db.ranking import RANK_COLUMNS, rerank_posts
+
+# When enabled, like/dislike and favorite/unfavorite only record the reaction
+# in memory and answer 202; a background task writes them in batches.
+WRITE_BEHIND_REACTIONS = os.getenv('WRITE_BEHIND_REACTIONS', 'false').lower() in ('1', 'true', 'yes')
+WRITE_BEHIND_QUEUE_SIZE = int(os.getenv('WRITE_BEHIND_QUEUE_SIZE', 10000))
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv('WRITE_BEHIND_BATCH_SIZE', 500))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv('WRITE_BEHIND_FLUSH_INTERVAL', 0.2))
+WRITE_BEHIND_RETRY_AFTER = int(os.getenv('WRITE_BEHIND_RETRY_AFTER', 1))
+WRITE_BEHIND_DRAIN_ATTEMPTS = 3
+
+logger = logging.getLogger('api.write_behind')
+
+# kind -> (association table, its post column, the Post counter it drives)
+REACTIONS = {
+    'like': (post_like, post_like.c.post_id, 'like_count'),
+    'favorite': (post_favorite, post_favorite.c.fav_id, 'favorite_count'),
+}
+
+
+class ReactionQueue:
+    """Coalescing buffer of reactions waiting to be written.
+
+    Pending reactions are keyed by (kind, user_id, post_id) and only the
+    latest state is kept, so a like followed by a dislike before the next
+    flush costs nothing. A flush applies up to ``batch_size`` of them in one
+    transaction: ON CONFLICT DO NOTHING inserts and RETURNING deletes report
+    the rows that really changed, and only those move the counters, so
+    replays and concurrent writers never double count. If the database
+    rejects the batch, its reactions are retried one at a time and any that
+    still violate a constraint are logged and dropped, so a single bad one
+    can't stall the queue. Once ``max_pending`` reactions are waiting new
+    ones are rejected with 503 rather than letting the backlog grow without
+    bound while the database is slow.
+
+    Reactions are held per process and lost if it is killed; close() drains
+    them on a normal shutdown."""
+
+    def __init__(self, enabled: bool, max_pending: int, batch_size: int, interval: float, retry_after: int):
+        self.enabled = enabled
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.interval = interval
+        self.retry_after = retry_after
+        self.pending = {}
+        self.inflight = {}
+        self.wakeup = None
+        self.flusher = None
+        self.closing = False
+        self.enqueued = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.applied = 0
+        self.failed_flushes = 0
+        self.quarantined = 0
+        self.flush_total = 0.0
+        self.flush_max = 0.0
+
+    def start(self):
+        if self.flusher is None:
+            self.wakeup = asyncio.Event()
+            self.flusher = asyncio.create_task(self.run())
+
+    def queued(self, key):
+        # Reactions being written are still the latest state until committed.
+        return self.pending.get(key) or self.inflight.get(key)
+
+    async def state(self, db, kind: str, user_id: int, post_id: int) -> bool:
+        """Whether the reaction exists, counting reactions not yet written."""
+        key = (kind, user_id, post_id)
+        if self.queued(key) is None:
+            table, post_column, _ = REACTIONS[kind]
+            exists = await db.scalar(
+                select(post_column).where(table.c.user_id == user_id, post_column == post_id)
+            )
+            # A request for the same reaction may have been queued meanwhile.
+            if self.queued(key) is None:
+                return exists is not None
+        return self.queued(key)[0]
+
+    async def submit(self, db, kind: str, user_id: int, post_id: int, author_id: int, active: bool) -> bool:
+        """Queues the reaction; False when it is already in that state."""
+        if await self.state(db, kind, user_id, post_id) == active:
+            return False
+        key = (kind, user_id, post_id)
+        if key in self.pending:
+            self.coalesced += 1
+        elif len(self.pending) >= self.max_pending or self.closing:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail='Too many pending reactions, try again later',
+                headers={'Retry-After': str(self.retry_after)}
+            )
+        self.start()
+        self.pending[key] = (active, author_id)
+        self.enqueued += 1
+        if len(self.pending) >= self.batch_size:
+            self.wakeup.set()
+        return True
+
+    async def run(self):
+        while not self.closing:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            while self.pending and not self.closing:
+                if not await self.flush():
+                    await asyncio.sleep(self.interval)
+                    break
+                if len(self.pending) < self.batch_size:
+                    break
+
+    async def flush(self) -> bool:
+        batch = dict(item for item, _ in zip(self.pending.items(), range(self.batch_size)))
+        for key in batch:
+            del self.pending[key]
+        # Until the batch is committed or requeued, state() answers from it:
+        # the database doesn't have these reactions yet.
+        self.inflight = batch
+        try:
+            return await self.write(batch)
+        finally:
+            self.inflight = {}
+
+    async def write(self, batch: dict) -> bool:
+        started = time.perf_counter()
+        dropped = 0
+        try:
+            posts, authors = await self.apply(batch)
+        except IntegrityError:
+            # One reaction the database refuses must not hold up the rest:
+            # retry them one by one and set aside the ones that still fail.
+            posts, authors = set(), set()
+            for index, (key, value) in enumerate(batch.items()):
+                try:
+                    applied_posts, applied_authors = await self.apply({key: value})
+                except IntegrityError:
+                    dropped += 1
+                    logger.error('Dropping queued reaction %s the database rejects', key, exc_info=True)
+                    continue
+                except Exception:
+                    self.failed(dict(list(batch.items())[index:]))
+                    await response_cache.invalidate('post', *posts)
+                    await response_cache.invalidate('user', *authors)
+                    return False
+                posts.update(applied_posts)
+                authors.update(applied_authors)
+        except Exception:
+            return self.failed(batch)
+        elapsed = time.perf_counter() - started
+        self.flushes += 1
+        self.applied += len(batch) - dropped
+        self.quarantined += dropped
+        self.flush_total += elapsed
+        self.flush_max = max(self.flush_max, elapsed)
+        write_behind_flush_duration.observe((), elapsed)
+        write_behind_batch_size.observe((), len(batch))
+        await response_cache.invalidate('post', *posts)
+        await response_cache.invalidate('user', *authors)
+        return True
+
+    def failed(self, batch: dict) -> bool:
+        self.failed_flushes += 1
+        logger.exception('Writing %d queued reactions failed, retrying', len(batch))
+        # Keep whatever was queued for the same reactions since.
+        self.pending = {**batch, **self.pending}
+        return False
+
+    async def apply(self, batch: dict):
+        changed = {}
+        authors = {}
+        db = new_session()
+        try:
+            # Reactions to posts deleted since they were queued are dropped
+            # rather than failing the foreign key.
+            reacted = {post_id for (_, _, post_id), (active, _) in batch.items() if active}
+            existing = set(await db.scalars(select(Post.id).where(Post.id.in_(reacted)))) if reacted else set()
+            for kind, (table, post_column, counter) in REACTIONS.items():
+                added, removed = [], []
+                for (reaction, user_id, post_id), (active, _) in batch.items():
+                    if reaction == kind and (post_id in existing or not active):
+                        (added if active else removed).append((post_id, user_id))
+                # Rows are touched in key order so concurrent flushes from
+                # other workers can't deadlock against this one.
+                added.sort()
+                removed.sort()
+                deltas = Counter()
+                if added:
+                    inserted = await db.execute(
+                        insert_ignore(db, table).returning(post_column),
+                        [{'user_id': user_id, post_column.key: post_id} for post_id, user_id in added]
+                    )
+                    deltas.update(inserted.scalars())
+                if removed:
+                    deleted = await db.execute(
+                        delete(table).where(tuple_(post_column, table.c.user_id).in_(removed)).returning(post_column)
+                    )
+                    deltas.subtract(deleted.scalars())
+                by_delta = {}
+                for post_id, delta in deltas.items():
+                    if delta:
+                        by_delta.setdefault(delta, []).append(post_id)
+                for delta, post_ids in by_delta.items():
+                    counters = await db.execute(
+                        update(Post).where(Post.id.in_(sorted(post_ids)))
+                        .values({counter: getattr(Post, counter) + delta}).returning(*RANK_COLUMNS)
+                    )
+                    # A post in both the like and the favorite pass is
+                    # reranked from the counters returned last.
+                    changed.update((row.id, row) for row in counters)
+            await rerank_posts(db, list(changed.values()))
+            await db.commit()
+        finally:
+            await db.close()
+        for (_, _, post_id), (_, author_id) in batch.items():
+            if post_id in changed:
+                authors[post_id] = author_id
+        return list(changed), set(authors.values())
+
+    async def close(self):
+        """Stops the flusher and writes out what is still queued."""
+        self.closing = True
+        if self.flusher is not None:
+            self.wakeup.set()
+            await self.flusher
+            self.flusher = None
+        for _ in range(WRITE_BEHIND_DRAIN_ATTEMPTS):
+            while self.pending and await self.flush():
+                pass
+            if not self.pending:
+                break
+        if self.pending:
+            logger.error('Dropped %d queued reactions on shutdown', len(self.pending))
+        self.closing = False
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'pending': len(self.pending),
+            'inflight': len(self.inflight),
+            'max_pending': self.max_pending,
+            'enqueued': self.enqueued,
+            'coalesced': self.coalesced,
+            'rejected': self.rejected,
+            'flushes': self.flushes,
+            'applied': self.applied,
+            'failed_flushes': self.failed_flushes,
+            'quarantined': self.quarantined,
+            'flush_avg_ms': self.flush_total / self.flushes * 1000 if self.flushes else 0.0,
+            'flush_max_ms': self.flush_max * 1000,
+        }
+
+
+reaction_queue = ReactionQueue(
+    WRITE_BEHIND_REACTIONS, WRITE_BEHIND_QUEUE_SIZE, WRITE_BEHIND_BATCH_SIZE, WRITE_BEHIND_FLUSH_INTERVAL,
+    WRITE_BEHIND_RETRY_AFTER
+)
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Table
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Float, Integer, Index, String, ForeignKey, Table
 from sqlalchemy.orm import relationship
 from core.database import Base
 
@@ -6,40 +8,56 @@ from core.database import Base
 class User(Base):
     __tablename__ = 'users'
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     username = Column(String, unique=True, index=True)
     email = Column(String, unique=True, index=True)
     password = Column(String)
     fullname = Column(String)
 
-    posts = relationship("Post", back_populates="author")
-    liked_posts = relationship("Post", secondary='post_like', back_populates="liked_by")
-    favorite_posts = relationship("Post", secondary='post_favorite', back_populates="favorite_by")
+    posts = relationship("Post", back_populates="author", lazy="raise_on_sql")
+    liked_posts = relationship("Post", secondary='post_like', back_populates="liked_by", lazy="raise_on_sql")
+    favorite_posts = relationship("Post", secondary='post_favorite', back_populates="favorite_by", lazy="raise_on_sql")
 
 
 post_like = Table(
     "post_like",
     Base.metadata,
-    Column("user_id", Integer, ForeignKey("users.id")),
-    Column("post_id", Integer, ForeignKey("posts.id"))
+    Column("user_id", Integer, ForeignKey("users.id"), primary_key=True),
+    Column("post_id", Integer, ForeignKey("posts.id"), primary_key=True),
+    # The primary key serves lookups by user; this one serves lookups by post.
+    Index("ix_post_like_post_id_user_id", "post_id", "user_id", unique=True)
 )
 
 post_favorite = Table(
     "post_favorite",
     Base.metadata,
-    Column('user_id', Integer, ForeignKey("users.id")),
-    Column("fav_id", Integer, ForeignKey("posts.id"))
+    Column('user_id', Integer, ForeignKey("users.id"), primary_key=True),
+    Column("fav_id", Integer, ForeignKey("posts.id"), primary_key=True),
+    Index("ix_post_favorite_fav_id_user_id", "fav_id", "user_id", unique=True)
 )
 
 
 class Post(Base):
     __tablename__ = "posts"
+    __table_args__ = (Index("ix_posts_author_id_id", "author_id", "id"),)
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     title = Column(String)
     content = Column(String)
     author_id = Column(Integer, ForeignKey("users.id"))
+    like_count = Column(Integer, nullable=False, default=0, server_default='0')
+    favorite_count = Column(Integer, nullable=False, default=0, server_default='0')
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    author = relationship("User", back_populates="posts", lazy="raise_on_sql")
+    liked_by = relationship("User", secondary='post_like', back_populates="liked_posts", lazy="raise_on_sql")
+    favorite_by = relationship("User", secondary='post_favorite', back_populates="favorite_posts", lazy="raise_on_sql")
+
 
-    author = relationship("User", back_populates="posts")
-    liked_by = relationship("User", secondary='post_like', back_populates="liked_posts")
-    favorite_by = relationship("User", secondary='post_favorite', back_populates="favorite_posts")
+post_ranking = Table(
+    "post_ranking",
+    Base.metadata,
+    Column("post_id", Integer, ForeignKey("posts.id"), primary_key=True),
+    Column("score", Float, nullable=False),
+    Index("ix_post_ranking_score", "score", "post_id")
+)
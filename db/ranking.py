@@ -0,0 +1,96 @@
+"""Precomputed ranking behind GET /feed.
+
+    python -m db.ranking rebuild
+
+A post's score is log10(1 + likes + FEED_FAVORITE_WEIGHT * favorites) plus
+its age bonus, creation time / FEED_DECAY_SECONDS. Every FEED_DECAY_SECONDS
+a post has to earn ten times the points to keep its place against newer
+ones, which is the same as decaying older posts. Because the time term is
+fixed at creation, scores never have to be recomputed as time passes, only
+when a post's counters change. Rebuild after changing either setting.
+"""
+import argparse
+import math
+import os
+from datetime import datetime
+
+from sqlalchemy import and_, bindparam, delete, insert, or_, select, update
+from sqlalchemy.orm import joinedload
+
+from db.models import Post, post_ranking
+
+FEED_EPOCH = datetime(2023, 1, 1)
+FEED_DECAY_SECONDS = float(os.getenv('FEED_DECAY_SECONDS', 45000))
+FEED_FAVORITE_WEIGHT = float(os.getenv('FEED_FAVORITE_WEIGHT', 2))
+REBUILD_BATCH_SIZE = 5000
+
+# Only the score of a row changes, so a single executemany updates a batch.
+update_score = (
+    update(post_ranking)
+    .where(post_ranking.c.post_id == bindparam('ranked_post_id'))
+    .values(score=bindparam('ranked_score'))
+)
+
+
+def post_score(like_count: int, favorite_count: int, created_at: datetime) -> float:
+    points = like_count + FEED_FAVORITE_WEIGHT * favorite_count
+    return math.log10(1 + max(points, 0)) + (created_at - FEED_EPOCH).total_seconds() / FEED_DECAY_SECONDS
+
+
+def score_rows(posts):
+    """``posts`` are rows with id, like_count, favorite_count and created_at."""
+    return [
+        {'post_id': post.id, 'score': post_score(post.like_count, post.favorite_count, post.created_at)}
+        for post in posts
+    ]
+
+
+async def rank_new_posts(db, posts):
+    if posts:
+        await db.execute(insert(post_ranking), score_rows(posts))
+
+
+async def rerank_posts(db, posts):
+    if posts:
+        await db.execute(
+            update_score,
+            [{'ranked_post_id': row['post_id'], 'ranked_score': row['score']} for row in score_rows(posts)]
+        )
+
+
+# Counter updates return what the new score needs.
+RANK_COLUMNS = (Post.id, Post.like_count, Post.favorite_count, Post.created_at)
+
+
+def feed_query(after, limit: int):
+    """Highest score first; ``after`` is the (score, id) of the last row seen."""
+    score = post_ranking.c.score
+    query = select(Post, score.label('score')).join(post_ranking, post_ranking.c.post_id == Post.id)
+    if after is not None:
+        after_score, after_id = after
+        query = query.where(or_(score < after_score, and_(score == after_score, Post.id < after_id)))
+    return query.options(joinedload(Post.author)).order_by(score.desc(), Post.id.desc()).limit(limit)
+
+
+def rebuild(connection):
+    """Recomputes every score from the posts' counters in one transaction."""
+    connection.execute(delete(post_ranking))
+    posts = connection.execute(
+        select(*RANK_COLUMNS).execution_options(yield_per=REBUILD_BATCH_SIZE)
+    )
+    ranked = 0
+    for batch in posts.partitions():
+        connection.execute(insert(post_ranking), score_rows(batch))
+        ranked += len(batch)
+    return ranked
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['rebuild'])
+    parser.parse_args()
+
+    from core.database import engine
+
+    with engine.begin() as connection:
+        print(f'Ranked {rebuild(connection)} posts')
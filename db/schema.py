@@ -0,0 +1,112 @@
+"""Schema bootstrap and Alembic revision checks.
+
+    python -m db.schema upgrade   # alembic upgrade head
+    python -m db.schema check     # exits 1 unless the database is at the head revision
+    python -m db.schema create    # create_all and stamp head, for throwaway databases
+    python -m db.schema drop
+
+The app never creates tables itself. At startup it only compares the
+database's Alembic revision with the migration head, as set by SCHEMA_CHECK.
+"""
+import argparse
+import logging
+import os
+
+from sqlalchemy.exc import DBAPIError
+from starlette.concurrency import run_in_threadpool
+
+from core.database import Base, engine
+
+ALEMBIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'alembic')
+ALEMBIC_INI = os.path.join(os.path.dirname(ALEMBIC_DIR), 'alembic.ini')
+
+# What startup does when the database is behind or ahead of the migrations:
+# 'strict' refuses to start, 'warn' logs and carries on, 'off' skips the check.
+SCHEMA_CHECK = os.getenv('SCHEMA_CHECK', 'warn')
+
+logger = logging.getLogger('db.schema')
+
+
+def alembic_config():
+    # Alembic is only needed by these commands and the startup check, so it is
+    # imported here rather than on every app import.
+    from alembic.config import Config
+
+    config = Config(ALEMBIC_INI)
+    config.set_main_option('script_location', ALEMBIC_DIR)
+    return config
+
+
+def head_revisions():
+    from alembic.script import ScriptDirectory
+
+    return set(ScriptDirectory.from_config(alembic_config()).get_heads())
+
+
+def current_revisions():
+    from alembic.runtime.migration import MigrationContext
+
+    with engine.connect() as connection:
+        return set(MigrationContext.configure(connection).get_current_heads())
+
+
+def revision_status():
+    current, heads = current_revisions(), head_revisions()
+    return current == heads, current, heads
+
+
+def describe(current, heads):
+    return f'database is at {sorted(current) or "no revision"}, migrations are at {sorted(heads)}'
+
+
+async def check_schema(mode: str = SCHEMA_CHECK):
+    if mode == 'off':
+        return
+    try:
+        ok, current, heads = await run_in_threadpool(revision_status)
+    except (DBAPIError, OSError) as e:
+        if mode == 'strict':
+            raise
+        logger.warning('Skipping the schema check, the database is unreachable: %s', e)
+        return
+    if ok:
+        return
+    message = f'Schema out of date: {describe(current, heads)}; run python -m db.schema upgrade'
+    if mode == 'strict':
+        raise RuntimeError(message)
+    logger.warning(message)
+
+
+def upgrade():
+    from alembic import command
+
+    command.upgrade(alembic_config(), 'head')
+
+
+def create():
+    from alembic import command
+
+    import db.search  # noqa: F401 -- registers the full-text search DDL with create_all
+
+    Base.metadata.create_all(bind=engine)
+    command.stamp(alembic_config(), 'head')
+
+
+def drop():
+    import db.search  # noqa: F401
+
+    Base.metadata.drop_all(bind=engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql('DROP TABLE IF EXISTS alembic_version')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['check', 'upgrade', 'create', 'drop'])
+    args = parser.parse_args()
+
+    if args.command == 'check':
+        ok, current, heads = revision_status()
+        print(('Schema up to date: ' if ok else 'Schema out of date: ') + describe(current, heads))
+        raise SystemExit(0 if ok else 1)
+    {'upgrade': upgrade, 'create': create, 'drop': drop}[args.command]()
@@ -0,0 +1,67 @@
+import re
+
+from sqlalchemy import DDL, Float, and_, cast, column, event, false, func, literal_column, or_, select, table
+from sqlalchemy.orm import joinedload
+
+from db.models import Post
+
+# Postgres keeps a weighted tsvector as a generated column next to the row and
+# indexes it with GIN; SQLite keeps an external-content FTS5 table in sync with
+# triggers. Both are created by migration 6430aee472e8 and, for create_all,
+# by the after_create hooks below.
+POSTGRES_DDL = [
+    "ALTER TABLE posts ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(content, '')), 'B')) STORED",
+    "CREATE INDEX ix_posts_search_vector ON posts USING gin (search_vector)",
+]
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE posts_fts USING fts5(title, content, content='posts', content_rowid='id')",
+    "CREATE TRIGGER posts_fts_insert AFTER INSERT ON posts BEGIN "
+    "INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+    "CREATE TRIGGER posts_fts_delete AFTER DELETE ON posts BEGIN "
+    "INSERT INTO posts_fts(posts_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); END",
+    "CREATE TRIGGER posts_fts_update AFTER UPDATE OF title, content ON posts BEGIN "
+    "INSERT INTO posts_fts(posts_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); "
+    "INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+]
+
+for statement in POSTGRES_DDL:
+    event.listen(Post.__table__, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+for statement in SQLITE_DDL:
+    event.listen(Post.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+event.listen(Post.__table__, 'after_drop', DDL('DROP TABLE IF EXISTS posts_fts').execute_if(dialect='sqlite'))
+
+posts_fts = table('posts_fts', column('rowid'))
+
+WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def fts5_query(q: str) -> str:
+    # Quote every word so user input can't be parsed as FTS5 operators.
+    return ' '.join(f'"{word}"' for word in WORD.findall(q))
+
+
+def search_posts_query(dialect: str, q: str, after, limit: int):
+    """Ranked match query; ``after`` is the (rank, id) of the last row seen."""
+    if dialect == 'postgresql':
+        tsquery = func.websearch_to_tsquery('english', q)
+        search_vector = literal_column('posts.search_vector')
+        rank = cast(func.ts_rank(search_vector, tsquery), Float)
+        query = select(Post, rank.label('rank')).where(search_vector.op('@@')(tsquery))
+    elif dialect == 'sqlite':
+        match = fts5_query(q)
+        rank = -func.bm25(literal_column('posts_fts'))
+        query = (
+            select(Post, rank.label('rank'))
+            .join(posts_fts, posts_fts.c.rowid == Post.id)
+            .where(literal_column('posts_fts').op('MATCH')(match) if match else false())
+        )
+    else:
+        raise NotImplementedError(f'Full-text search is not available for {dialect}')
+
+    if after is not None:
+        after_rank, after_id = after
+        query = query.where(or_(rank < after_rank, and_(rank == after_rank, Post.id > after_id)))
+    return query.options(joinedload(Post.author)).order_by(rank.desc(), Post.id).limit(limit)
@@ -1,30 +1,41 @@
-from fastapi import FastAPI
-from api import auth, posts
-from core.database import Base, engine
+from contextlib import asynccontextmanager
 
-app = FastAPI()
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from api import auth, posts, stats
+from core.database import async_engine, engine, replicas
+from core.compression import CompressionMiddleware
+from core.metrics import MetricsMiddleware, instrument_engine
+from core.hashing import hash_pool
+from core.email_verification import email_verifier
+from core.write_behind import reaction_queue
+from db.schema import check_schema
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Importing this module touches neither the database nor the network, so
+    # workers boot fast and still import when Postgres is down; the schema is
+    # managed with python -m db.schema and only checked here.
+    await check_schema()
+    yield
+    # Queued reactions are written before the pools they need are torn down.
+    await reaction_queue.close()
+    await email_verifier.close()
+    hash_pool.shutdown()
+
+
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
 
 app.include_router(auth.router)
 app.include_router(posts.router)
-
-
-def create_tables():
-    Base.metadata.create_all(bind=engine)
-
-
-def drop_tables():
-    Base.metadata.drop_all(bind=engine)
-
-
-def run_migrations():
-    import subprocess
-
-    subprocess.run(['alembic', 'upgrade', 'head'])
-
-
-def setup():
-    create_tables()
-    # run_migrations()
-
-
-setup()
+app.include_router(stats.router)
+# Metrics wraps compression so response sizes are the bytes actually sent.
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+instrument_engine(engine)
+instrument_engine(async_engine)
+for replica in replicas:
+    instrument_engine(replica.engine)
+    instrument_engine(replica.async_engine)
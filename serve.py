@@ -0,0 +1,187 @@
+"""Production server: gunicorn managing uvicorn workers.
+
+    python -m serve                                  # WEB_CONCURRENCY workers on BIND
+    python -m serve --workers 4 --bind 0.0.0.0:8000 --pid /run/api.pid
+    python -m serve restart --pid /run/api.pid       # rolling restart
+
+The master checks the schema once, imports the app and warms it up (OpenAPI
+schema, a first request to each list endpoint) before forking, so every
+worker starts with the imports, validators and compiled SQL it inherits
+copy-on-write and only has to open its own connection pools. The lifespan of
+each worker then skips the schema check. Workers are recycled after
+MAX_REQUESTS requests, plus up to MAX_REQUESTS_JITTER so they don't all
+restart at once.
+
+``restart`` replaces the workers one at a time: it adds a worker (TTIN),
+waits, then retires the oldest (TTOU), so capacity never drops. Forked
+workers run the code the master imported; to deploy new code send USR2 to
+the master, which starts a new master and workers next to the old ones, then
+TERM the old master once the new one is serving.
+
+Several workers need the shared backends: with the in-memory defaults a
+write bumps response-cache versions only in the worker that handled it
+(the others keep serving the old body and 304s for RESPONSE_CACHE_TTL), and
+a logout or a spent refresh token is only revoked in one worker. So unless
+RESPONSE_CACHE_BACKEND and TOKEN_REVOCATION_BACKEND are 'redis' (with
+REDIS_URL pointing at the server), a warning is logged and one worker runs
+whatever ``--workers`` or WEB_CONCURRENCY ask for; ``--allow-local-state``
+starts them all anyway. Two per-worker caches remain even with redis: user
+snapshots (stale for at most PRINCIPAL_CACHE_TTL after a profile change)
+and the read-your-writes pins, which only keep a writer's reads on the
+primary in the worker that served the write.
+
+Each worker holds DB_POOL_SIZE + DB_MAX_OVERFLOW connections at most, so
+size those against max_connections (or put PgBouncer in front and use
+DB_POOL_MODE=pooler) when raising the worker count.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import time
+
+from gunicorn.app.base import BaseApplication
+
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', os.cpu_count() or 1))
+BIND = os.getenv('BIND', '0.0.0.0:8000')
+MAX_REQUESTS = int(os.getenv('MAX_REQUESTS', 10000))
+MAX_REQUESTS_JITTER = int(os.getenv('MAX_REQUESTS_JITTER', MAX_REQUESTS // 10))
+GRACEFUL_TIMEOUT = int(os.getenv('GRACEFUL_TIMEOUT', 30))
+WORKER_TIMEOUT = int(os.getenv('WORKER_TIMEOUT', 60))
+KEEPALIVE = int(os.getenv('KEEPALIVE', 5))
+
+# Read-only requests that touch the routing, validation, serialization and
+# SQL compilation paths without writing or caching anything.
+WARMUP_PATHS = ('/openapi.json', '/posts/?limit=1', '/feed?limit=1', '/posts/search?q=warmup&limit=1')
+
+logger = logging.getLogger('serve')
+
+
+def warm_up(app):
+    import httpx
+    from core.database import async_engine, engine, replicas
+
+    async def requests():
+        transport = httpx.ASGITransport(app=app)
+        headers = {'Accept-Encoding': 'identity'}
+        async with httpx.AsyncClient(transport=transport, base_url='http://warmup', headers=headers) as client:
+            for path in WARMUP_PATHS:
+                try:
+                    await client.get(path)
+                except Exception as e:
+                    logger.warning('Warm-up request %s failed: %s', path, e)
+        # Connections are bound to this event loop and must not reach the workers.
+        await async_engine.dispose()
+        for replica in replicas:
+            await replica.async_engine.dispose()
+
+    started = time.perf_counter()
+    asyncio.run(requests())
+    engine.dispose()
+    for replica in replicas:
+        replica.engine.dispose()
+    logger.info('Warmed up in %.0f ms', (time.perf_counter() - started) * 1000)
+
+
+def post_fork(server, worker):
+    from core.database import after_fork
+
+    after_fork()
+
+
+class Server(BaseApplication):
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        import main
+
+        warm_up(main.app)
+        return main.app
+
+
+def serve(args):
+    logging.basicConfig(level=logging.INFO)
+
+    from core.response_cache import RESPONSE_CACHE_BACKEND
+    from core.revocation import TOKEN_REVOCATION_BACKEND
+
+    local = [
+        name for name, backend in (
+            ('RESPONSE_CACHE_BACKEND', RESPONSE_CACHE_BACKEND), ('TOKEN_REVOCATION_BACKEND', TOKEN_REVOCATION_BACKEND)
+        )
+        if backend != 'redis'
+    ]
+    if args.workers > 1 and local:
+        message = (
+            f'{args.workers} workers with per-process {" and ".join(local)}: writes and logouts in one worker are '
+            'invisible to the others, which serve stale responses and accept revoked tokens. Set them to redis.'
+        )
+        if args.allow_local_state:
+            logger.warning(message)
+        else:
+            logger.warning(message + ' Starting 1 worker (--allow-local-state starts them all).')
+            args.workers = 1
+
+    # Process-wide defaults have to be in place before the app is imported:
+    # the schema is checked here once instead of in every worker, and the
+    # bcrypt processes are split between the workers instead of each worker
+    # starting one per core.
+    schema_check = os.getenv('SCHEMA_CHECK', 'warn')
+    os.environ['SCHEMA_CHECK'] = 'off'
+    os.environ.setdefault('HASH_POOL_SIZE', str(max(1, (os.cpu_count() or 1) // args.workers)))
+
+    from db.schema import check_schema
+
+    asyncio.run(check_schema(schema_check))
+
+    Server({
+        'bind': args.bind,
+        'workers': args.workers,
+        'worker_class': 'uvicorn.workers.UvicornWorker',
+        'preload_app': True,
+        'post_fork': post_fork,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': MAX_REQUESTS_JITTER,
+        'graceful_timeout': GRACEFUL_TIMEOUT,
+        'timeout': WORKER_TIMEOUT,
+        'keepalive': KEEPALIVE,
+        'pidfile': args.pid,
+    }).run()
+
+
+def rolling_restart(args):
+    if not args.pid:
+        raise SystemExit('restart needs --pid')
+    with open(args.pid) as f:
+        master = int(f.read().strip())
+    for _ in range(args.workers):
+        os.kill(master, signal.SIGTTIN)
+        time.sleep(args.interval)
+        os.kill(master, signal.SIGTTOU)
+    print(f'Replaced {args.workers} workers of {master}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', nargs='?', choices=['run', 'restart'], default='run')
+    parser.add_argument('--workers', type=int, default=WEB_CONCURRENCY)
+    parser.add_argument('--bind', default=BIND)
+    parser.add_argument('--max-requests', type=int, default=MAX_REQUESTS, help='Recycle a worker after this many requests')
+    parser.add_argument('--pid', help='PID file of the master')
+    parser.add_argument(
+        '--allow-local-state', action='store_true', help='Run several workers with the in-memory cache and revocation set'
+    )
+    parser.add_argument('--interval', type=float, default=5, help='restart: seconds a new worker gets to boot')
+    args = parser.parse_args()
+
+    if args.command == 'restart':
+        rolling_restart(args)
+    else:
+        serve(args)
@@ -0,0 +1,39 @@
+import os
+import tempfile
+
+# Settings are read when the app modules are imported, so the test database
+# has to be chosen before any of them are.
+DATABASE_DIR = tempfile.mkdtemp(prefix='fastapiproj-tests-')
+os.environ['DATABASE_URL'] = f'sqlite:///{DATABASE_DIR}/test.db'
+os.environ['DATABASE_REPLICA_URLS'] = ''
+os.environ['SCHEMA_CHECK'] = 'off'
+
+import pytest
+from fastapi.testclient import TestClient
+
+from benchmarks.seed import SEED_PASSWORD, seed
+
+SEED_USERS = 20
+SEED_POSTS = 200
+
+
+@pytest.fixture(scope='session')
+def client():
+    seed(SEED_USERS, SEED_POSTS, likes_per_post=2, favorites_per_post=1, alpha=1.5, random_seed=42)
+
+    import main
+    from benchmarks.load import StubEmailVerifier
+    from core.email_verification import get_email_verifier
+
+    main.app.dependency_overrides[get_email_verifier] = StubEmailVerifier
+    with TestClient(main.app) as client:
+        yield client
+    main.app.dependency_overrides.clear()
+
+
+def login(client, username: str, password: str = SEED_PASSWORD) -> dict:
+    return client.post('/auth/login', data={'username': username, 'password': password}).json()
+
+
+def bearer(tokens: dict) -> dict:
+    return {'Authorization': f'Bearer {tokens["access_token"]}'}
@@ -0,0 +1,27 @@
+def test_each_encoding_has_its_own_strong_etag(client):
+    identity = client.get('/auth/profile/1', headers={'Accept-Encoding': 'identity'})
+    compressed = client.get('/auth/profile/1', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['content-encoding'] == 'gzip'
+    assert compressed.headers['etag'] == identity.headers['etag'][:-1] + '-gzip"'
+    assert compressed.json() == identity.json()
+
+
+def test_revalidating_the_encoded_representation(client):
+    etag = client.get('/auth/profile/1', headers={'Accept-Encoding': 'gzip'}).headers['etag']
+
+    response = client.get('/auth/profile/1', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['etag'] == etag
+
+    # The gzip validator doesn't match the identity representation.
+    response = client.get('/auth/profile/1', headers={'Accept-Encoding': 'identity', 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert not response.headers['etag'].endswith('-gzip"')
+
+
+def test_compressed_requests_keep_their_route_label(client):
+    response = client.get('/feed', params={'limit': 50}, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['content-encoding'] == 'gzip'
+    metrics = client.get('/metrics').text
+    assert 'http_request_duration_seconds_count{method="GET",route="/feed",status="200"}' in metrics
+    assert 'route="unmatched"' not in metrics
@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import func, select
+
+from conftest import bearer, login
+from core.database import engine
+from db.models import Post, post_favorite, post_like
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def reactions(post_id):
+    """(like rows, like_count, favorite rows, favorite_count) of the post."""
+    with engine.connect() as connection:
+        likes = connection.scalar(select(func.count()).select_from(post_like).where(post_like.c.post_id == post_id))
+        favorites = connection.scalar(
+            select(func.count()).select_from(post_favorite).where(post_favorite.c.fav_id == post_id)
+        )
+        counters = connection.execute(select(Post.like_count, Post.favorite_count).where(Post.id == post_id)).first()
+    return likes, counters and counters.like_count, favorites, counters and counters.favorite_count
+
+
+def test_counters_follow_reactions(client):
+    author = bearer(login(client, 'user18'))
+    first, second = bearer(login(client, 'user19')), bearer(login(client, 'user20'))
+    post_id = client.post('/posts/create', json={'title': 'counted', 'content': 'c'}, headers=author).json()['id']
+
+    assert client.post(f'/posts/{post_id}/like', headers=first).status_code == 200
+    assert client.post(f'/posts/{post_id}/like', headers=first).status_code == 400
+    assert reactions(post_id)[:2] == (1, 1)
+
+    response = client.post('/posts/likes/bulk', json={'post_ids': [post_id, post_id]}, headers=second)
+    assert [result['status_code'] for result in response.json()] == [200, 400]
+    assert client.post('/posts/likes/bulk', json={'post_ids': [post_id]}, headers=first).json()[0]['status_code'] == 400
+    assert reactions(post_id)[:2] == (2, 2)
+
+    assert client.post(f'/posts/{post_id}/dislike', headers=first).status_code == 200
+    assert client.post(f'/posts/{post_id}/dislike', headers=first).status_code == 400
+    assert reactions(post_id)[:2] == (1, 1)
+
+    assert client.post(f'/posts/{post_id}/favorite', headers=first).status_code == 200
+    assert client.post(f'/posts/{post_id}/favorite', headers=first).status_code == 400
+    assert client.post(f'/posts/{post_id}/favorite', headers=second).status_code == 200
+    assert client.post(f'/posts/{post_id}/unfavorite', headers=second).status_code == 200
+    assert client.post(f'/posts/{post_id}/unfavorite', headers=second).status_code == 400
+    assert reactions(post_id) == (1, 1, 1, 1)
+    assert client.get(f'/posts/{post_id}').json()['like_count'] == 1
+
+    assert client.delete(f'/posts/{post_id}', headers=author).status_code == 200
+    assert reactions(post_id) == (0, None, 0, None)
+
+
+def test_counters_match_rows_everywhere(client):
+    likes = select(func.count()).select_from(post_like).where(post_like.c.post_id == Post.id).scalar_subquery()
+    favorites = (
+        select(func.count()).select_from(post_favorite).where(post_favorite.c.fav_id == Post.id).scalar_subquery()
+    )
+    with engine.connect() as connection:
+        drifted = connection.scalars(
+            select(Post.id).where((Post.like_count != likes) | (Post.favorite_count != favorites))
+        ).all()
+    assert drifted == []
+
+
+def alembic(database: str, *args):
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{database}')
+    subprocess.run([sys.executable, '-m', 'alembic', *args], cwd=ROOT, env=env, check=True, capture_output=True)
+
+
+@pytest.mark.skipif(engine.dialect.name != 'sqlite', reason='Seeds the pre-counter schema with sqlite3')
+def test_migration_backfills_counters(tmp_path):
+    database = str(tmp_path / 'counters.db')
+    alembic(database, 'upgrade', '99e06da92e1d')
+    with sqlite3.connect(database) as connection:
+        connection.executemany('INSERT INTO users (id, username) VALUES (?, ?)', [(1, 'a'), (2, 'b'), (3, 'c')])
+        connection.executemany('INSERT INTO posts (id, title, author_id) VALUES (?, ?, 1)', [(1, 'x'), (2, 'y')])
+        # The unkeyed tables allowed duplicates and half-empty rows.
+        connection.executemany(
+            'INSERT INTO post_like (user_id, post_id) VALUES (?, ?)',
+            [(2, 1), (2, 1), (3, 1), (3, 2), (None, 2), (2, None)]
+        )
+        connection.executemany('INSERT INTO post_favorite (user_id, fav_id) VALUES (?, ?)', [(2, 2), (2, 2)])
+
+    alembic(database, 'upgrade', '14bb6dad1b5f')
+    with sqlite3.connect(database) as connection:
+        counters = connection.execute('SELECT id, like_count, favorite_count FROM posts ORDER BY id').fetchall()
+        likes = connection.execute('SELECT user_id, post_id FROM post_like ORDER BY post_id, user_id').fetchall()
+        favorites = connection.execute('SELECT user_id, fav_id FROM post_favorite').fetchall()
+    assert counters == [(1, 2, 0), (2, 1, 1)]
+    assert likes == [(2, 1), (3, 1), (3, 2)]
+    assert favorites == [(2, 2)]
@@ -0,0 +1,77 @@
+import asyncio
+
+import httpx
+
+from core.email_verification import CircuitBreaker, EmailVerifier
+
+
+def make_verifier(handler, failure_policy='allow'):
+    calls = []
+
+    def record(request):
+        calls.append(request.url.params['email'])
+        return handler(request)
+
+    verifier = EmailVerifier(url='https://verifier.test/check', api_key='key', failure_policy=failure_policy)
+    verifier.client = httpx.AsyncClient(transport=httpx.MockTransport(record))
+    verifier.breaker = CircuitBreaker(threshold=2, reset_after=60)
+    return verifier, calls
+
+
+def unavailable(request):
+    return httpx.Response(503)
+
+
+def verify(verifier, *emails):
+    async def run():
+        return [await verifier.verify(email) for email in emails]
+
+    return asyncio.run(run())
+
+
+def test_valid_result_is_cached():
+    verifier, calls = make_verifier(lambda request: httpx.Response(200, json={'data': {'status': 'valid'}}))
+    assert verify(verifier, 'a@example.com', 'A@Example.com ') == [True, True]
+    assert calls == ['a@example.com']
+
+
+def test_disposable_domain_is_rejected_without_lookups():
+    verifier, calls = make_verifier(lambda request: httpx.Response(200, json={'data': {'disposable': True}}))
+    assert verify(verifier, 'a@trash.test', 'b@trash.test') == [False, False]
+    assert calls == ['a@trash.test']
+
+
+def test_breaker_opens_after_threshold():
+    verifier, calls = make_verifier(unavailable)
+    assert verify(verifier, 'a@example.com', 'b@example.com', 'c@example.com', 'd@example.com') == [True] * 4
+    assert calls == ['a@example.com', 'b@example.com']
+    assert verifier.breaker.state == 'open'
+    assert verifier.degraded == 4
+
+
+def test_failure_policy_deny():
+    verifier, calls = make_verifier(unavailable, failure_policy='deny')
+    assert verify(verifier, 'a@example.com', 'b@example.com', 'c@example.com') == [False] * 3
+    assert len(calls) == 2
+
+
+def test_half_open_probe_closes_the_breaker():
+    healthy = False
+
+    def handler(request):
+        return httpx.Response(200, json={'data': {'status': 'valid'}}) if healthy else httpx.Response(503)
+
+    verifier, calls = make_verifier(handler, failure_policy='deny')
+    verify(verifier, 'a@example.com', 'b@example.com')
+    assert verifier.breaker.state == 'open'
+
+    verifier.breaker.reset_after = 0
+    assert verifier.breaker.state == 'half_open'
+    assert verify(verifier, 'c@example.com') == [False]
+    assert verifier.breaker.failures == 3
+    assert calls[-1] == 'c@example.com'
+
+    healthy = True
+    assert verify(verifier, 'd@example.com') == [True]
+    assert verifier.breaker.state == 'closed'
+    assert verifier.breaker.failures == 0
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from conftest import bearer, login
+from core.database import engine
+from db.models import Post
+from db.ranking import rebuild
+
+
+def feed_ids(client):
+    ids, after = [], None
+    while True:
+        params = {'limit': 100}
+        if after is not None:
+            params['after'] = after
+        page = client.get('/feed', params=params).json()
+        ids.extend(post['id'] for post in page['posts'])
+        after = page['next_cursor']
+        if after is None:
+            return ids
+
+
+def ranked_above(client, first: int, second: int) -> bool:
+    ids = feed_ids(client)
+    return ids.index(first) < ids.index(second)
+
+
+def create_posts(client, headers, count):
+    return [
+        client.post('/posts/create', json={'title': f'feed {n}', 'content': 'ranked'}, headers=headers).json()['id']
+        for n in range(count)
+    ]
+
+
+def test_newer_posts_rank_first_until_liked(client):
+    author = bearer(login(client, 'user11'))
+    older, newer = create_posts(client, author, 2)
+    assert ranked_above(client, newer, older)
+
+    for username in ('user12', 'user13'):
+        assert client.post(f'/posts/{older}/like', headers=bearer(login(client, username))).status_code == 200
+    assert ranked_above(client, older, newer)
+
+    for username in ('user12', 'user13'):
+        assert client.post(f'/posts/{older}/dislike', headers=bearer(login(client, username))).status_code == 200
+    assert ranked_above(client, newer, older)
+
+
+def test_a_favorite_outweighs_a_like(client):
+    author = bearer(login(client, 'user11'))
+    favorited, liked = create_posts(client, author, 2)
+    reader = bearer(login(client, 'user12'))
+    assert client.post(f'/posts/{liked}/like', headers=reader).status_code == 200
+    assert client.post(f'/posts/{favorited}/favorite', headers=reader).status_code == 200
+    assert ranked_above(client, favorited, liked)
+
+    assert client.post(f'/posts/{favorited}/unfavorite', headers=reader).status_code == 200
+    assert ranked_above(client, liked, favorited)
+
+
+def test_older_posts_need_more_points(client):
+    author = bearer(login(client, 'user11'))
+    aged, fresh = create_posts(client, author, 2)
+    for username in ('user12', 'user13', 'user14'):
+        assert client.post(f'/posts/{aged}/like', headers=bearer(login(client, username))).status_code == 200
+    assert ranked_above(client, aged, fresh)
+
+    # A day is about two decay periods: three likes no longer make up for it.
+    with engine.begin() as connection:
+        connection.execute(
+            update(Post).where(Post.id == aged).values(created_at=datetime.utcnow() - timedelta(days=1))
+        )
+        rebuild(connection)
+    assert ranked_above(client, fresh, aged)
+
+    # Reranking after a reaction keeps the post's age.
+    assert client.post(f'/posts/{aged}/like', headers=bearer(login(client, 'user15'))).status_code == 200
+    assert ranked_above(client, fresh, aged)
@@ -0,0 +1,42 @@
+import asyncio
+
+from fastapi import HTTPException
+
+from core.hashing import HashPool
+
+
+def run_with(pool, coroutine):
+    async def run():
+        try:
+            return await coroutine
+        finally:
+            pool.shutdown()
+
+    return asyncio.run(run())
+
+
+def test_hashes_round_trip_through_the_pool():
+    pool = HashPool(workers=2, max_pending=4, retry_after=1)
+
+    async def round_trip():
+        hashed = await pool.hash('correct horse')
+        return hashed, await pool.verify('correct horse', hashed), await pool.verify('wrong', hashed)
+
+    hashed, accepted, refused = run_with(pool, round_trip())
+    assert hashed.startswith('$2')
+    assert accepted and not refused
+    assert pool.stats()['completed'] == 3
+
+
+def test_rejects_calls_beyond_the_admission_limit():
+    pool = HashPool(workers=1, max_pending=2, retry_after=3)
+
+    async def burst():
+        return await asyncio.gather(*(pool.hash('password') for _ in range(4)), return_exceptions=True)
+
+    results = run_with(pool, burst())
+    rejected = [result for result in results if isinstance(result, HTTPException)]
+    assert len(rejected) == 2
+    assert all(error.status_code == 503 and error.headers == {'Retry-After': '3'} for error in rejected)
+    assert pool.stats()['rejected'] == 2
+    assert pool.stats()['completed'] == 2
@@ -0,0 +1,167 @@
+"""Upper bounds on the SQL statements each route issues.
+
+A budget failing means a handler started issuing extra statements, usually
+a lazy load or a per-row query; raise a budget only on purpose.
+"""
+import pytest
+from sqlalchemy import select
+
+from api.auth import user_snapshots
+from conftest import bearer, login
+from core.database import SessionLocal
+from core.query_counter import QueryCounter, assert_max_queries
+from db.models import User
+
+
+@pytest.fixture(scope='module')
+def author(client):
+    return login(client, 'user1')
+
+
+@pytest.fixture(scope='module')
+def reader(client):
+    return login(client, 'user2')
+
+
+@pytest.fixture
+def post_id(client, author):
+    return client.post('/posts/create', json={'title': 'budget', 'content': 'check'}, headers=bearer(author)).json()['id']
+
+
+def test_post_list(client):
+    with assert_max_queries(1):
+        first = client.get('/posts/', params={'limit': 20})
+    assert first.status_code == 200
+    with assert_max_queries(1):
+        assert client.get('/posts/', params={'limit': 20, 'after': first.json()['next_cursor']}).status_code == 200
+    with assert_max_queries(1):
+        assert client.get('/posts/', params={'limit': 20, 'fields': 'id,title'}).status_code == 200
+
+
+def test_post_stream(client):
+    # One statement per POSTS_STREAM_CHUNK_SIZE posts; the seed has fewer.
+    with assert_max_queries(1):
+        response = client.get('/posts/', params={'stream': True})
+    assert len(response.text.splitlines()) >= 200
+
+
+def test_search_and_feed(client):
+    with assert_max_queries(1):
+        assert client.get('/posts/search', params={'q': 'alpha'}).status_code == 200
+    with assert_max_queries(1):
+        assert client.get('/feed').status_code == 200
+
+
+def test_get_post(client, post_id):
+    with assert_max_queries(1):
+        assert client.get(f'/posts/{post_id}').status_code == 200
+    with assert_max_queries(0):
+        assert client.get(f'/posts/{post_id}').status_code == 200
+
+
+def test_create_posts(client, author):
+    with assert_max_queries(2):
+        assert client.post('/posts/create', json={'title': 't', 'content': 'c'}, headers=bearer(author)).status_code == 200
+    posts = [{'title': 't', 'content': 'c'}] * 10
+    # SQLite can't return the ids of a multi-row INSERT in parameter order,
+    # so it inserts row by row here; PostgreSQL sends one statement.
+    with assert_max_queries(len(posts) + 1):
+        response = client.post('/posts/bulk', json=posts, headers=bearer(author))
+    assert response.status_code == 200
+
+
+def test_update_and_delete_post(client, author, post_id):
+    with assert_max_queries(2):
+        response = client.put(f'/posts/{post_id}', json={'title': 't', 'content': 'u'}, headers=bearer(author))
+    assert response.status_code == 200
+    with assert_max_queries(5):
+        assert client.delete(f'/posts/{post_id}', headers=bearer(author)).status_code == 200
+
+
+def test_reactions(client, reader, post_id):
+    headers = bearer(reader)
+    with assert_max_queries(5):
+        assert client.post(f'/posts/{post_id}/like', headers=headers).status_code == 200
+    with assert_max_queries(4):
+        assert client.post(f'/posts/{post_id}/dislike', headers=headers).status_code == 200
+    with assert_max_queries(4):
+        assert client.post(f'/posts/{post_id}/favorite', headers=headers).status_code == 200
+    with assert_max_queries(4):
+        assert client.post(f'/posts/{post_id}/unfavorite', headers=headers).status_code == 200
+
+
+def test_bulk_likes(client, reader, author):
+    post_ids = [
+        post['post']['id']
+        for post in client.post('/posts/bulk', json=[{'title': 't', 'content': 'c'}] * 5, headers=bearer(author)).json()
+    ]
+    with assert_max_queries(5):
+        response = client.post('/posts/likes/bulk', json={'post_ids': post_ids}, headers=bearer(reader))
+    assert all(result['status_code'] == 200 for result in response.json())
+
+
+def test_reacted_listings(client, reader):
+    headers = bearer(reader)
+    with assert_max_queries(1):
+        assert client.get('/liked-posts', headers=headers).status_code == 200
+    with assert_max_queries(1):
+        assert client.get('/favorite-posts', params={'ids_only': True}, headers=headers).status_code == 200
+
+
+def test_register_and_login(client):
+    user = {'username': 'budget', 'email': 'budget@example.com', 'password': 'secret', 'fullname': 'Budget'}
+    with assert_max_queries(3):
+        assert client.post('/auth/register/', json=user).status_code == 200
+    with assert_max_queries(1):
+        tokens = login(client, 'budget', 'secret')
+    with assert_max_queries(0):
+        refreshed = client.post('/auth/refresh', json={'refresh_token': tokens['refresh_token']})
+    assert refreshed.status_code == 200
+    with assert_max_queries(0):
+        assert client.post('/auth/logout', headers=bearer(refreshed.json())).status_code == 200
+
+
+def test_profiles(client, author):
+    with assert_max_queries(2):
+        assert client.get('/auth/profile/1').status_code == 200
+    with assert_max_queries(1):
+        assert client.get('/auth/current_user', headers=bearer(author)).status_code == 200
+
+
+def current_user(client, headers):
+    return client.get('/auth/current_user', headers=headers)
+
+
+def test_cached_principal_skips_the_user_select(client):
+    headers = bearer(login(client, 'user16'))
+    with QueryCounter() as miss:
+        assert current_user(client, headers).status_code == 200
+    with assert_max_queries(miss.count - 1) as hit:
+        assert current_user(client, headers).status_code == 200
+    assert not any('FROM users' in statement for statement in hit.statements)
+
+
+def test_updating_a_user_evicts_the_snapshot(client):
+    headers = bearer(login(client, 'user17'))
+    user_id = current_user(client, headers).json()['user_profile']['id']
+    assert user_snapshots.get(user_id) is not None
+
+    with SessionLocal() as db:
+        db.scalar(select(User).where(User.id == user_id)).fullname = 'Renamed'
+        db.commit()
+    assert user_snapshots.get(user_id) is None
+    assert current_user(client, headers).json()['user_profile']['fullname'] == 'Renamed'
+
+
+def test_deleting_a_user_evicts_the_snapshot(client):
+    user = {'username': 'leaving', 'email': 'leaving@example.com', 'password': 'secret', 'fullname': 'Leaving'}
+    assert client.post('/auth/register/', json=user).status_code == 200
+    headers = bearer(login(client, 'leaving', 'secret'))
+    user_id = current_user(client, headers).json()['user_profile']['id']
+    assert user_snapshots.get(user_id) is not None
+
+    with SessionLocal() as db:
+        db.delete(db.get(User, user_id))
+        db.commit()
+    assert user_snapshots.get(user_id) is None
+    assert current_user(client, headers).status_code == 401
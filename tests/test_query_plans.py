@@ -0,0 +1,144 @@
+"""Query-plan regression check for the API's SQL.
+
+Drives every endpoint in api/posts.py and api/auth.py against the seeded test
+database, records each statement they issue and EXPLAINs it. A full table
+scan, or a nested loop over one, is a finding, and the test fails when a
+statement has a finding that isn't in the accepted baseline
+(tests/plan_baselines/sqlite.json). After a reviewed, intentional plan
+change, rewrite the baseline with
+
+    UPDATE_PLAN_BASELINE=1 python -m pytest tests/test_query_plans.py
+"""
+import hashlib
+import json
+import os
+import re
+
+import pytest
+from sqlalchemy import event
+
+from benchmarks.load import dataset_bounds
+from conftest import bearer, login
+from core.database import async_engine, engine
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'plan_baselines', 'sqlite.json')
+UPDATE_PLAN_BASELINE = os.getenv('UPDATE_PLAN_BASELINE', '').lower() in ('1', 'true', 'yes')
+EXPLAINED = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+PLACEHOLDER_LIST = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+
+
+class StatementLog:
+    def __init__(self):
+        self.endpoint = None
+        self.statements = {}
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        if self.endpoint is None or not statement.lstrip().upper().startswith(EXPLAINED):
+            return
+        if executemany:
+            parameters = parameters[0]
+        normalized = PLACEHOLDER_LIST.sub('(?)', ' '.join(statement.split()))
+        key = hashlib.blake2b(normalized.encode(), digest_size=8).hexdigest()
+        self.statements.setdefault(key, (self.endpoint, normalized, statement, tuple(parameters)))
+
+
+def drive(client, log: StatementLog):
+    max_user_id, max_post_id = dataset_bounds()
+
+    def call(method, path, **kwargs):
+        log.endpoint = f'{method} {path}'
+        try:
+            return client.request(method, path, **kwargs)
+        finally:
+            log.endpoint = None
+
+    tokens = login(client, 'user1')
+    headers = bearer(tokens)
+    other_post = next(post['id'] for post in client.get('/posts/').json()['posts'] if post['author']['id'] != 1)
+
+    call('GET', '/posts/')
+    call('GET', '/posts/', params={'after': max_post_id // 2, 'fields': 'id,title'})
+    call('GET', '/posts/search', params={'q': 'alpha bravo'})
+    feed = call('GET', '/feed').json()
+    call('GET', '/feed', params={'after': feed['next_cursor']})
+    call('GET', f'/posts/{other_post}')
+    created = call('POST', '/posts/create', json={'title': 'plan', 'content': 'check'}, headers=headers).json()
+    call('POST', '/posts/bulk', json=[{'title': 'plan', 'content': 'check'}] * 3, headers=headers)
+    call('PUT', f'/posts/{created["id"]}', json={'title': 'plan', 'content': 'updated'}, headers=headers)
+    call('POST', f'/posts/{other_post}/like', headers=headers)
+    call('POST', f'/posts/{other_post}/dislike', headers=headers)
+    call('POST', '/posts/likes/bulk', json={'post_ids': [other_post, max_post_id]}, headers=headers)
+    call('POST', f'/posts/{other_post}/favorite', headers=headers)
+    call('POST', f'/posts/{other_post}/unfavorite', headers=headers)
+    call('GET', '/liked-posts', headers=headers)
+    call('GET', '/favorite-posts', params={'ids_only': True}, headers=headers)
+    call('DELETE', f'/posts/{created["id"]}', headers=headers)
+
+    call('POST', '/auth/register/', json={
+        'username': 'plan-check', 'email': 'plan-check@example.com', 'password': 'x', 'fullname': 'Plan Check'
+    })
+    call('GET', f'/auth/profile/{max_user_id}')
+    call('GET', '/auth/current_user', headers=headers)
+    refreshed = call('POST', '/auth/refresh', json={'refresh_token': tokens['refresh_token']}).json()
+    call('POST', '/auth/logout', headers=bearer(refreshed))
+
+
+def findings(connection, statement, parameters):
+    cursor = connection.cursor()
+    cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+    found = []
+    loops = 0
+    for _, parent, _, detail in cursor.fetchall():
+        if not detail.startswith(('SCAN ', 'SEARCH ')) or 'VIRTUAL TABLE' in detail:
+            continue
+        loops += 1
+        if detail.startswith('SCAN ') and ' INDEX ' not in detail:
+            table = detail.split()[1]
+            # Every SQLite join is a nested loop; a full scan as an inner loop
+            # runs once per outer row.
+            found.append(f'Nested Loop over SCAN {table}' if loops > 1 else f'SCAN {table}')
+    return found
+
+
+@pytest.fixture(scope='module')
+def plans(client):
+    with engine.begin() as connection:
+        connection.exec_driver_sql('ANALYZE')
+    log = StatementLog()
+    # Whichever DB_MODE the suite runs in, statements are EXPLAINed through
+    # the blocking driver with the parameters they ran with.
+    targets = (engine, async_engine.sync_engine)
+    for target in targets:
+        event.listen(target, 'before_cursor_execute', log.record)
+    try:
+        drive(client, log)
+    finally:
+        for target in targets:
+            event.remove(target, 'before_cursor_execute', log.record)
+    connection = engine.raw_connection()
+    try:
+        return {
+            key: {'endpoint': endpoint, 'sql': normalized, 'findings': findings(connection, statement, parameters)}
+            for key, (endpoint, normalized, statement, parameters)
+            in sorted(log.statements.items(), key=lambda item: item[1][:2])
+        }
+    finally:
+        connection.close()
+
+
+def test_no_plan_regressions(plans):
+    if UPDATE_PLAN_BASELINE:
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(plans, f, indent=2)
+            f.write('\n')
+        pytest.skip(f'{len(plans)} statement plans written to {BASELINE_PATH}')
+
+    with open(BASELINE_PATH) as f:
+        baseline = json.load(f)
+    regressions = []
+    for key, plan in plans.items():
+        accepted = baseline.get(key, {}).get('findings', [])
+        new = [finding for finding in plan['findings'] if finding not in accepted]
+        if new:
+            regressions.append(f'{plan["endpoint"]}: {", ".join(new)}\n    {plan["sql"]}')
+    assert not regressions, 'Plan regressions:\n' + '\n'.join(regressions)
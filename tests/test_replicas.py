@@ -0,0 +1,71 @@
+import asyncio
+import os
+
+import pytest
+
+from conftest import bearer, login
+from core import database
+from core.database import DB_MODE, Replica, async_engine, engine, open_read_session
+
+
+def engine_of(replica=None):
+    # Sessions are bound to the sync engines when DB_MODE=sync.
+    if replica is None:
+        return engine if DB_MODE == 'sync' else async_engine
+    return replica.engine if DB_MODE == 'sync' else replica.async_engine
+
+
+@pytest.fixture
+def replica_urls(monkeypatch):
+    created = []
+
+    def use(*urls):
+        created.extend(Replica(url) for url in urls)
+        monkeypatch.setattr(database, 'replicas', list(created))
+        return created
+
+    yield use
+    for replica in created:
+        replica.engine.dispose()
+        asyncio.run(replica.async_engine.dispose())
+    database.recent_writers.clear()
+
+
+def read_bind(user_id=None):
+    async def run():
+        db = await open_read_session(user_id)
+        try:
+            return db.bind
+        finally:
+            await db.close()
+
+    return asyncio.run(run())
+
+
+def test_reads_go_to_a_healthy_replica(replica_urls):
+    replica, = replica_urls(os.environ['DATABASE_URL'])
+    assert read_bind() is engine_of(replica)
+    assert replica.failures == 0
+
+
+def test_unreachable_replica_falls_back_to_the_primary(replica_urls, tmp_path):
+    down, up = replica_urls(f'sqlite:///{tmp_path}/missing/replica.db', os.environ['DATABASE_URL'])
+    binds = {read_bind(), read_bind()}
+    assert binds == {engine_of(up)}
+    assert down.failures == 1
+    assert not down.healthy
+
+    up.mark_down()
+    assert read_bind() is engine_of()
+
+
+def test_recent_writer_reads_from_the_primary(client, replica_urls):
+    replica, = replica_urls(os.environ['DATABASE_URL'])
+    tokens = login(client, 'user4')
+    user_id = client.get('/auth/current_user', headers=bearer(tokens)).json()['user_profile']['id']
+    assert read_bind(user_id) is engine_of(replica)
+
+    response = client.post('/posts/create', json={'title': 'pinned', 'content': 'read'}, headers=bearer(tokens))
+    assert response.status_code == 200
+    assert read_bind(user_id) is engine_of()
+    assert read_bind() is engine_of(replica)
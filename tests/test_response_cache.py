@@ -0,0 +1,35 @@
+import asyncio
+
+from core.response_cache import MemoryBackend, ResponseCache
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_expired_version_never_reuses_a_number():
+    cache = ResponseCache(MemoryBackend(maxsize=10, versions_size=10))
+    run(cache.invalidate('post', 1))
+    stale = run(cache.key('post', 1))
+    run(cache.backend.set(stale, b'old', cache.ttl))
+
+    # The version expiring reads as 0; bumping it again must not land on
+    # the key the stale entry is stored under.
+    cache.backend.versions.clear()
+    assert run(cache.key('post', 1)) == 'response:post:1:v0'
+    run(cache.invalidate('post', 1))
+    assert run(cache.key('post', 1)) != stale
+
+
+def test_evicting_a_version_drops_the_entries():
+    backend = MemoryBackend(maxsize=10, versions_size=2)
+    cache = ResponseCache(backend)
+    run(backend.set(run(cache.key('post', 1)), b'old', cache.ttl))
+    run(cache.invalidate('post', 1))
+    run(cache.invalidate('post', 2))
+    assert len(backend.entries) == 1
+
+    run(cache.invalidate('post', 3))
+    assert run(backend.get('version:post:1')) is None
+    assert run(backend.get('response:post:1:v0')) is None
+    assert backend.stats()['versions']['evictions'] == 1
@@ -0,0 +1,41 @@
+from conftest import bearer, login
+
+
+def search_pages(client, q, limit):
+    ids, after = [], None
+    while True:
+        params = {'q': q, 'limit': limit}
+        if after is not None:
+            params['after'] = after
+        response = client.get('/posts/search', params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page['posts']) <= limit
+        ids.extend(post['id'] for post in page['posts'])
+        after = page['next_cursor']
+        if after is None:
+            return ids
+
+
+def test_pages_cover_the_results_once(client):
+    everything = client.get('/posts/search', params={'q': 'alpha', 'limit': 500}).json()
+    assert everything['next_cursor'] is None
+    expected = [post['id'] for post in everything['posts']]
+    assert len(expected) > 20
+
+    paged = search_pages(client, 'alpha', 7)
+    assert paged == expected
+    assert len(set(paged)) == len(paged)
+
+
+def test_matches_new_posts(client):
+    headers = bearer(login(client, 'user3'))
+    created = client.post('/posts/create', json={'title': 'zeppelin', 'content': 'once'}, headers=headers).json()
+    assert search_pages(client, 'zeppelin', 5) == [created['id']]
+
+
+def test_invalid_cursor(client):
+    for after in ('nonsense', '1.5', 'x:1'):
+        response = client.get('/posts/search', params={'q': 'alpha', 'after': after})
+        assert response.status_code == 400
+        assert response.json()['detail'] == 'Invalid cursor'
@@ -0,0 +1,98 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+
+from conftest import bearer, login
+from core.revocation import MemoryRevocationStore
+from core.security import ALGORITHM, SECRET_KEY
+
+
+def refresh(client, refresh_token):
+    return client.post('/auth/refresh', json={'refresh_token': refresh_token})
+
+
+def test_refresh_tokens_are_single_use(client):
+    tokens = login(client, 'user9')
+    renewed = refresh(client, tokens['refresh_token'])
+    assert renewed.status_code == 200
+    assert client.get('/auth/current_user', headers=bearer(renewed.json())).status_code == 200
+
+    assert refresh(client, tokens['refresh_token']).status_code == 401
+    assert refresh(client, renewed.json()['refresh_token']).status_code == 200
+
+
+def test_concurrent_redemptions_issue_one_pair(client):
+    import main
+
+    refresh_token = login(client, 'user9')['refresh_token']
+
+    async def redeem_all():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as concurrent:
+            return await asyncio.gather(*(
+                concurrent.post('/auth/refresh', json={'refresh_token': refresh_token}) for _ in range(10)
+            ))
+
+    statuses = sorted(response.status_code for response in asyncio.run(redeem_all()))
+    assert statuses == [200] + [401] * 9
+
+
+def test_token_types_are_not_interchangeable(client):
+    tokens = login(client, 'user9')
+    assert refresh(client, tokens['access_token']).status_code == 401
+    assert client.get('/auth/current_user', headers=bearer({'access_token': tokens['refresh_token']})).status_code == 401
+
+
+def test_logout_revokes_both_tokens(client):
+    tokens = login(client, 'user9')
+    headers = bearer(tokens)
+    assert client.get('/auth/current_user', headers=headers).status_code == 200
+
+    response = client.post('/auth/logout', json={'refresh_token': tokens['refresh_token']}, headers=headers)
+    assert response.status_code == 200
+    assert client.get('/auth/current_user', headers=headers).status_code == 401
+    assert client.post('/auth/logout', headers=headers).status_code == 401
+    assert refresh(client, tokens['refresh_token']).status_code == 401
+
+
+def test_logout_keeps_other_users_refresh_tokens(client):
+    mine, theirs = login(client, 'user9'), login(client, 'user10')
+    client.post('/auth/logout', json={'refresh_token': theirs['refresh_token']}, headers=bearer(mine))
+    assert refresh(client, theirs['refresh_token']).status_code == 200
+
+
+def test_legacy_tokens_without_jti_or_type(client):
+    user_id = client.get('/auth/current_user', headers=bearer(login(client, 'user9'))).json()['user_profile']['id']
+    legacy = jwt.encode(
+        {'sub': str(user_id), 'exp': datetime.utcnow() + timedelta(minutes=5)}, SECRET_KEY, algorithm=ALGORITHM
+    )
+    headers = bearer({'access_token': legacy})
+    assert client.get('/auth/current_user', headers=headers).status_code == 200
+    # It is an access token and can't be redeemed for a new pair.
+    assert refresh(client, legacy).status_code == 401
+    assert client.post('/auth/logout', headers=headers).status_code == 200
+
+
+def test_memory_store_refuses_instead_of_evicting():
+    async def run():
+        store = MemoryRevocationStore(maxsize=2)
+        now = time.time()
+        assert await store.revoke('expired', now - 1)
+        assert await store.revoke('a', now + 60)
+        # The expired id is purged to make room.
+        assert await store.revoke('b', now + 60)
+        assert not await store.revoke('a', now + 60)
+        with pytest.raises(HTTPException) as excinfo:
+            await store.revoke('c', now + 60)
+        assert await store.is_revoked('a') and await store.is_revoked('b')
+        return store, excinfo.value
+
+    store, error = asyncio.run(run())
+    assert error.status_code == 503
+    assert 'Retry-After' in error.headers
+    assert store.stats() == {'size': 2, 'maxsize': 2, 'rejected': 1}
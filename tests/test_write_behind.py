@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+from conftest import bearer, login
+from core import write_behind
+from core.database import engine
+from core.write_behind import ReactionQueue
+from db.models import Post, post_like
+
+
+class NoRows:
+    """Stands in for a session when no reaction exists in the database."""
+
+    async def scalar(self, statement):
+        return None
+
+
+def make_queue(max_pending=100):
+    return ReactionQueue(True, max_pending, batch_size=100, interval=60, retry_after=7)
+
+
+def test_coalesces_to_the_latest_state():
+    async def run():
+        queue = make_queue()
+        assert await queue.submit(NoRows(), 'like', 1, 10, 2, True)
+        assert not await queue.submit(NoRows(), 'like', 1, 10, 2, True)
+        assert await queue.submit(NoRows(), 'like', 1, 10, 2, False)
+        return queue
+
+    queue = asyncio.run(run())
+    assert queue.pending == {('like', 1, 10): (False, 2)}
+    assert queue.stats()['coalesced'] == 1
+    assert queue.stats()['enqueued'] == 2
+
+
+def test_rejects_reactions_beyond_the_cap():
+    async def run():
+        queue = make_queue(max_pending=1)
+        await queue.submit(NoRows(), 'like', 1, 10, 2, True)
+        # The same reaction coalesces even when the queue is full.
+        await queue.submit(NoRows(), 'like', 1, 10, 2, False)
+        with pytest.raises(HTTPException) as excinfo:
+            await queue.submit(NoRows(), 'favorite', 1, 10, 2, True)
+        return queue, excinfo.value
+
+    queue, error = asyncio.run(run())
+    assert error.status_code == 503
+    assert error.headers == {'Retry-After': '7'}
+    assert queue.stats()['rejected'] == 1
+
+
+def test_reactions_being_written_count_as_queued():
+    async def run(fail):
+        queue = make_queue()
+        writing, release = asyncio.Event(), asyncio.Event()
+
+        async def apply(batch):
+            writing.set()
+            await release.wait()
+            if fail:
+                raise RuntimeError('database went away')
+            return [], set()
+
+        queue.apply = apply
+        await queue.submit(NoRows(), 'like', 1, 10, 2, True)
+        flush = asyncio.create_task(queue.flush())
+        await writing.wait()
+        assert not queue.pending
+        # The like is not in the database yet but must not be lost.
+        assert await queue.state(NoRows(), 'like', 1, 10)
+        assert await queue.submit(NoRows(), 'like', 1, 10, 2, False)
+        release.set()
+        await flush
+        return queue
+
+    queue = asyncio.run(run(fail=False))
+    assert queue.pending == {('like', 1, 10): (False, 2)}
+    assert not queue.inflight
+
+    # A failed write requeues the batch without overwriting newer reactions.
+    queue = asyncio.run(run(fail=True))
+    assert queue.pending == {('like', 1, 10): (False, 2)}
+    assert queue.stats()['failed_flushes'] == 1
+
+
+def like_rows(post_id):
+    with engine.connect() as connection:
+        rows = connection.scalar(select(func.count()).select_from(post_like).where(post_like.c.post_id == post_id))
+        counter = connection.scalar(select(Post.like_count).where(Post.id == post_id))
+    return rows, counter
+
+
+def test_queued_reactions_are_written(client, monkeypatch):
+    monkeypatch.setattr(write_behind.reaction_queue, 'enabled', True)
+    monkeypatch.setattr(write_behind.reaction_queue, 'interval', 0.01)
+    author = bearer(login(client, 'user5'))
+    post_id = client.post('/posts/create', json={'title': 'queued', 'content': 'likes'}, headers=author).json()['id']
+    readers = [bearer(login(client, f'user{n}')) for n in (6, 7, 8)]
+
+    for headers in readers:
+        response = client.post(f'/posts/{post_id}/like', headers=headers)
+        assert response.status_code == 202
+    assert client.post(f'/posts/{post_id}/like', headers=readers[0]).status_code == 400
+    assert client.post(f'/posts/{post_id}/dislike', headers=readers[1]).status_code == 202
+
+    deadline = time.monotonic() + 5
+    while write_behind.reaction_queue.pending or write_behind.reaction_queue.inflight:
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+    assert like_rows(post_id) == (2, 2)
+    assert client.get(f'/posts/{post_id}').json()['like_count'] == 2